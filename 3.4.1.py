@@ -1,6 +1,13 @@
+import contextlib
+import os
 import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
 
 class ExchangeRateConverter:
     """Класс, используемый для представления конвертатора курсов валют."""
@@ -59,18 +66,145 @@ class ExchangeRateConverter:
         year, month = row['published_at'][:4], row['published_at'][5:7]
         return self.convert_to_rubles(year, month, row['salary'], salary_currency)
 
-    def parse_vacancies(self, vacancies_filename: str, result_filename: str):
+    def convert_columns_to_rubles(self, data: pd.DataFrame):
+        """Переводит столбец зарплат в рубли для всех строк сразу.
+
+        Курс для каждой строки выбирается из таблицы курсов по ключу (год-месяц, валюта)
+        одной выборкой NumPy, без построчного вызова convert_to_rubles.
+
+        Args:
+            data (pd.DataFrame): Вакансии со столбцами salary, salary_currency и published_at
+
+        Returns:
+            pd.Series: Зарплаты в рублях (NaN, если валюта неизвестна или курс отсутствует)
+        """
+        salary = data['salary'].to_numpy(dtype='float64')
+        currency = data['salary_currency']
+        date_key = data['published_at'].str[:7]
+        date_positions = self.exchange_rate.index.get_indexer(date_key)
+        currency_positions = self.exchange_rate.columns.get_indexer(currency)
+        found = (date_positions >= 0) & (currency_positions >= 0)
+        rates = np.full(len(data), np.nan)
+        rates[found] = self.exchange_rate.to_numpy(dtype='float64')[date_positions[found], currency_positions[found]]
+        result = np.trunc(rates * salary)
+        is_rur = (currency == 'RUR').to_numpy()
+        result[is_rur] = salary[is_rur]
+        return pd.Series(result, index=data.index)
+
+    def convert_vacancies(self, data: pd.DataFrame):
+        """Рассчитывает зарплату в рублях и оставляет нужные столбцы.
+
+        Args:
+            data (pd.DataFrame): Исходные вакансии
+
+        Returns:
+            pd.DataFrame: Обработанные вакансии
+        """
+        data['salary'] = data[['salary_from', 'salary_to']].mean(1)
+        data['salary'] = self.convert_columns_to_rubles(data)
+        return data[['name', 'salary', 'area_name', 'published_at']]
+
+    def parse_vacancies(self, vacancies_filename: str, result_filename: str, chunk_size: int = None,
+                        columnar_filename: str = None):
         """Обрабатывает вакансии и сохраняет результат в csv файл.
 
+        Если указан chunk_size, файл читается и записывается частями по chunk_size строк,
+        поэтому потребление памяти зависит от размера части, а не от размера файла.
+        Результат совпадает с обработкой всего файла целиком.
+
         Args:
             vacancies_filename (str): Имя файла с вакансиями
             result_filename (str): Имя файла после обработки
+            chunk_size (int): Количество строк в одной части, None - обработать файл целиком
+            columnar_filename (str): Имя колоночного файла Arrow IPC, который записывается вместе с csv файлом,
+                None - не записывать
         """
-        data = pd.read_csv(vacancies_filename, delimiter=',')
-        data['salary'] = data[['salary_from', 'salary_to']].mean(1)
-        data['salary'] = data.apply(lambda r: self.convert_row_to_rubles(r), 1)
-        data[['name', 'salary', 'area_name', 'published_at']].to_csv(result_filename, encoding="utf-8", index=False)
+        columnar_file = ColumnarVacanciesWriter(columnar_filename) if columnar_filename else contextlib.nullcontext()
+        with columnar_file:
+            if chunk_size is None:
+                data = self.convert_vacancies(pd.read_csv(vacancies_filename, delimiter=','))
+                data.to_csv(result_filename, encoding="utf-8", index=False)
+                if columnar_filename:
+                    columnar_file.write(data)
+                return
+            with open(result_filename, 'w', encoding="utf-8", newline='') as result_file:
+                is_first_chunk = True
+                for chunk in pd.read_csv(vacancies_filename, delimiter=',', chunksize=chunk_size):
+                    data = self.convert_vacancies(chunk)
+                    data.to_csv(result_file, index=False, header=is_first_chunk)
+                    if columnar_filename:
+                        columnar_file.write(data)
+                    is_first_chunk = False
+                if is_first_chunk:
+                    pd.read_csv(vacancies_filename, delimiter=',', nrows=0).pipe(self.convert_vacancies)\
+                        .to_csv(result_file, index=False)
+
+
+class ColumnarVacanciesWriter:
+    """Класс, используемый для записи обработанных вакансий в колоночный файл Arrow IPC.
+
+    Названия вакансий и регионов хранятся словарями, год и месяц публикации - в int32.
+    Файл записывается без сжатия, поэтому его можно читать через memory map.
+    Новые значения словаря каждой части дописываются в конец словаря предыдущих частей,
+    поэтому файл можно записывать частями. Файл пишется во временный файл
+    и заменяет результат только после успешной записи.
+
+    Attributes:
+        filename (str): Имя колоночного файла
+        categories (dict): Значения словарей, записанные в предыдущих частях
+    """
+
+    category_columns = ['name', 'area_name']
+
+    def __init__(self, filename: str):
+        """Инициализирует экземпляр ColumnarVacanciesWriter.
 
+        Args:
+            filename (str): Имя колоночного файла
+        """
+        if pa is None:
+            raise ImportError('Для записи колоночного файла требуется пакет pyarrow')
+        self.filename = filename
+        self.categories = {column: pd.Index([], dtype=object) for column in ColumnarVacanciesWriter.category_columns}
+        self.schema = pa.schema([('name', pa.dictionary(pa.int32(), pa.string())),
+                                 ('salary', pa.float64()),
+                                 ('area_name', pa.dictionary(pa.int32(), pa.string())),
+                                 ('published_at', pa.string()),
+                                 ('year', pa.int32()),
+                                 ('month', pa.int32())])
+        self.__writer = pa.ipc.new_file(f'{filename}.tmp', self.schema,
+                                        options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.__writer.close()
+        if exc_type is None:
+            os.replace(f'{self.filename}.tmp', self.filename)
+        else:
+            os.remove(f'{self.filename}.tmp')
+
+    def write(self, data: pd.DataFrame):
+        """Записывает часть обработанных вакансий.
 
-exchange_rate_converter = ExchangeRateConverter('currencies.csv')
-exchange_rate_converter.parse_vacancies('vacancies_dif_currencies.csv', 'parsed_vacancies.csv')
+        Args:
+            data (pd.DataFrame): Обработанные вакансии со столбцами name, salary, area_name и published_at
+        """
+        columns = {}
+        for column in ColumnarVacanciesWriter.category_columns:
+            values = data[column]
+            new_categories = pd.Index(values.dropna().unique()).difference(self.categories[column], sort=False)
+            self.categories[column] = self.categories[column].append(new_categories)
+            columns[column] = pd.Categorical(values, categories=self.categories[column])
+        columns['salary'] = data['salary'].to_numpy(dtype='float64')
+        columns['published_at'] = data['published_at'].to_numpy()
+        columns['year'] = data['published_at'].str[:4].astype('int32').to_numpy()
+        columns['month'] = data['published_at'].str[5:7].astype('int32').to_numpy()
+        batch = pd.DataFrame(columns, columns=self.schema.names)
+        self.__writer.write_batch(pa.RecordBatch.from_pandas(batch, schema=self.schema, preserve_index=False))
+
+
+if __name__ == '__main__':
+    exchange_rate_converter = ExchangeRateConverter('currencies.csv')
+    exchange_rate_converter.parse_vacancies('vacancies_dif_currencies.csv', 'parsed_vacancies.csv')
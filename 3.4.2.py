@@ -1,10 +1,20 @@
-import pdfkit
-import matplotlib.pyplot as plt
 import numpy as np
+import argparse
+import base64
 import csv
+import copy
+import functools
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
 import os
+import shutil
+import threading
+import time
 import pandas as pd
-from jinja2 import Environment, FileSystemLoader
+from vacancies_cube import VacanciesCube
 
 
 class DataSet:
@@ -12,7 +22,6 @@ class DataSet:
 
     Attributes:
         __columns (list): Названия столбцов csv файла
-        __reader (_reader): Reader для чтения файла
         vacancies_year_salaries (dict): Средняя зарплата по годам
         vacancies_year_count (dict): Количество вакансий по годам
         profession_salaries (dict): Средняя зарплата по выбранной профессии по годам
@@ -20,6 +29,7 @@ class DataSet:
         vacancies_area_salaries (dict): Средняя зарплата по городам
         vacancies_area_count (dict): Количество вакансий по городам
         fractions (dict): Доли вакансий по городам
+        timings (dict): Длительность шагов расчета статистики в секундах
     """
 
     def __init__(self, filename: str):
@@ -28,9 +38,8 @@ class DataSet:
         Args:
             filename (str): Имя исходного файла с вакансиями
         """
-        vacancies_file = open(filename, 'r', encoding="utf-8-sig")
-        self.__reader = csv.reader(vacancies_file)
-        self.__columns = next(self.__reader)
+        with open(filename, 'r', encoding="utf-8-sig") as vacancies_file:
+            self.__columns = next(csv.reader(vacancies_file))
         self.vacancies_year_salaries = {}
         self.vacancies_year_count = {}
         self.vacancies_area_salaries = {}
@@ -38,6 +47,8 @@ class DataSet:
         self.profession_salaries = {}
         self.profession_count = {}
         self.fractions = {}
+        self.timings = {}
+        self.__cube = None
 
     def is_file_empty(self):
         """Возвращает True, если файл с вакансиями пуст, в другом случае False.
@@ -47,42 +58,260 @@ class DataSet:
         """
         return True if not self.__columns else False
 
-    def process_statistics(self, csv_filename: str, profession: str):
+    @staticmethod
+    def match_unique_values(column: pd.Series, match):
+        """Проверяет строки столбца, вызывая проверку только для уникальных значений.
+
+        Названия вакансий и регионов часто повторяются, поэтому проверка выполняется
+        один раз для каждого значения, а результат распространяется на все строки.
+
+        Args:
+            column (pd.Series): Столбец со строками
+            match: Функция, принимающая строковый аксессор .str и возвращающая маску
+
+        Returns:
+            pd.Series: Маска строк, удовлетворяющих проверке
+        """
+        codes, uniques = pd.factorize(column)
+        return pd.Series(DataSet.match_uniques(uniques, match)[codes], index=column.index)
+
+    @staticmethod
+    def match_uniques(uniques, match):
+        """Проверяет уникальные значения столбца, полученные pd.factorize.
+
+        Args:
+            uniques: Уникальные значения столбца
+            match: Функция, принимающая строковый аксессор .str и возвращающая маску
+
+        Returns:
+            np.ndarray: Маска уникальных значений с дополнительным элементом False для пропусков (код -1)
+        """
+        return np.append(np.asarray(match(pd.Series(uniques, dtype=object).str), dtype=bool), False)
+
+    def process_statistics(self, csv_filename: str, profession: str, profile: bool = False):
         """Рассчитывает статистику по выбранной профессии
 
+        Статистика рассчитывается по кубу вакансий (см. VacanciesCube), а не по исходным строкам.
+        Длительность каждого шага сохраняется в timings.
+
         Args:
             csv_filename (str): Имя csv файла с вакансиями
             profession (str): Выбранная профессия
+            profile (bool): Вывести длительность шагов расчета
+        """
+        cube = self.__read_cube(csv_filename)
+        self.__process_year_statistics(cube)
+        started_at = time.perf_counter()
+        is_profession = DataSet.match_unique_values(cube['name'], lambda names: names.contains(profession))
+        profession_statistics = DataSet.sum_statistics(cube[is_profession], 'publish_year')
+        self.profession_salaries = profession_statistics['salary'].dropna().astype('int').to_dict()
+        self.profession_count = profession_statistics['vacancy_count'].to_dict()
+        self.__save_timing('profession_statistics', started_at)
+        self.__process_area_statistics(cube)
+        if profile:
+            self.display_timings()
+
+    def process_batch_statistics(self, csv_filename: str, queries: list, profile: bool = False):
+        """Рассчитывает статистику сразу для нескольких запросов.
+
+        Куб вакансий читается, а общая статистика рассчитывается один раз, после чего статистика
+        каждой профессии собирается из строк куба, названия которых подходят под запрос.
+        Шаблоны запросов проверяются только для уникальных названий.
+
+        Args:
+            csv_filename (str): Имя csv файла с вакансиями
+            queries (list): Профессии
+            profile (bool): Вывести длительность шагов расчета
+
+        Returns:
+            list: Экземпляры DataSet со статистикой для каждого запроса в порядке queries
+        """
+        self.prepare_statistics(csv_filename)
+        results = self.get_query_statistics(queries)
+        if profile:
+            self.display_timings()
+        return results
+
+    def prepare_statistics(self, csv_filename: str):
+        """Читает куб вакансий и рассчитывает общую статистику по годам и по городам.
+
+        После вызова статистику запросов можно получать через get_query_statistics без повторного чтения куба.
+
+        Args:
+            csv_filename (str): Имя csv файла с вакансиями
+        """
+        self.__cube = self.__read_cube(csv_filename)
+        self.__process_year_statistics(self.__cube)
+        self.__process_area_statistics(self.__cube)
+
+    def get_query_statistics(self, queries: list):
+        """Рассчитывает статистику запросов по кубу, прочитанному prepare_statistics.
+
+        Args:
+            queries (list): Профессии
+
+        Returns:
+            list: Экземпляры DataSet со статистикой для каждого запроса в порядке queries
+        """
+        started_at = time.perf_counter()
+        cube = self.__cube
+        name_codes, names = pd.factorize(cube['name'])
+        results = []
+        for profession in queries:
+            is_query = DataSet.match_uniques(names, lambda values: values.contains(profession))[name_codes]
+            profession_statistics = DataSet.sum_statistics(cube[is_query], 'publish_year')
+            dataset = copy.copy(self)
+            dataset.profession_salaries = profession_statistics['salary'].dropna().astype('int').to_dict()
+            dataset.profession_count = profession_statistics['vacancy_count'].to_dict()
+            results.append(dataset)
+        self.__save_timing('profession_statistics', started_at)
+        return results
+
+    @staticmethod
+    def get_columnar_filename(csv_filename: str):
+        """Возвращает имя колоночного файла Arrow IPC, соответствующего csv файлу.
+
+        Args:
+            csv_filename (str): Имя csv файла с вакансиями
+
+        Returns:
+            str: Имя колоночного файла
+        """
+        return f'{os.path.splitext(csv_filename)[0]}.arrow'
+
+    @staticmethod
+    def has_columnar_file(csv_filename: str):
+        """Возвращает True, если рядом с csv файлом есть колоночный файл не старше его и установлен pyarrow.
+
+        Args:
+            csv_filename (str): Имя csv файла с вакансиями
+
+        Returns:
+            bool: True, если вакансии можно прочитать из колоночного файла, в другом случае False
+        """
+        columnar_filename = DataSet.get_columnar_filename(csv_filename)
+        return importlib.util.find_spec('pyarrow') is not None and os.path.exists(columnar_filename) \
+            and os.path.getmtime(columnar_filename) >= os.path.getmtime(csv_filename)
+
+    def __read_vacancies(self, csv_filename: str):
+        """Читает вакансии и добавляет столбец с годом публикации.
+
+        Если есть колоночный файл, записанный вместе с csv файлом, вакансии читаются из него
+        через memory map, а год публикации берется из готового столбца.
+
+        Args:
+            csv_filename (str): Имя csv файла с вакансиями
+
+        Returns:
+            pd.DataFrame: Вакансии
         """
+        started_at = time.perf_counter()
+        if DataSet.has_columnar_file(csv_filename):
+            import pyarrow.feather as feather
+            data = feather.read_table(DataSet.get_columnar_filename(csv_filename),
+                                      columns=['name', 'salary', 'area_name', 'year'], memory_map=True).to_pandas()
+            self.__save_timing('read_columnar', started_at)
+            return data.rename(columns={'year': 'publish_year'})
         data = pd.read_csv(csv_filename, delimiter=',')
-        data['publish_year'] = data['published_at'].apply(lambda d: int(d[:4]))
-        vacancies_year_salaries = data.groupby('publish_year')['salary'].mean()
-        self.vacancies_year_salaries = vacancies_year_salaries.astype('int').to_dict()
-        vacancies_year_count = data['publish_year'].value_counts().sort_index()
-        self.vacancies_year_count = vacancies_year_count.to_dict()
-        vacancies_for_profession = data[data['name'].str.contains(profession)]
-        profession_salaries = vacancies_for_profession.groupby('publish_year')['salary'].mean().dropna()
-        self.profession_salaries = profession_salaries.astype('int').to_dict()
-        profession_count = vacancies_for_profession['publish_year'].value_counts().sort_index()
-        self.profession_count = profession_count.to_dict()
-        vacancies_area_count = data['area_name'].value_counts()
+        started_at = self.__save_timing('read_csv', started_at)
+        data['publish_year'] = data['published_at'].str[:4].astype('int')
+        self.__save_timing('publish_year', started_at)
+        return data
+
+    def __read_cube(self, csv_filename: str):
+        """Читает куб вакансий, при необходимости строя или дополняя его.
+
+        Args:
+            csv_filename (str): Имя csv файла с вакансиями
+
+        Returns:
+            pd.DataFrame: Куб вакансий
+        """
+        started_at = time.perf_counter()
+        cube = VacanciesCube(csv_filename).load(self.__read_vacancies)
+        self.__save_timing('read_cube', started_at)
+        return cube
+
+    @staticmethod
+    def sum_statistics(cube: pd.DataFrame, column: str, sort: bool = True):
+        """Складывает строки куба по значениям столбца и рассчитывает среднюю зарплату.
+
+        Args:
+            cube (pd.DataFrame): Куб вакансий
+            column (str): Столбец группировки
+            sort (bool): Упорядочить результат по значениям столбца, иначе - по первому появлению
+
+        Returns:
+            pd.DataFrame: Средняя зарплата salary и количество вакансий vacancy_count
+        """
+        statistics = cube.groupby(column, sort=sort)[VacanciesCube.value_columns].sum()
+        statistics['salary'] = statistics['salary_sum'] / statistics['salary_count']
+        return statistics
+
+    def __process_year_statistics(self, cube: pd.DataFrame):
+        """Рассчитывает среднюю зарплату и количество вакансий по годам.
+
+        Args:
+            cube (pd.DataFrame): Куб вакансий
+        """
+        started_at = time.perf_counter()
+        year_statistics = DataSet.sum_statistics(cube, 'publish_year')
+        self.vacancies_year_salaries = year_statistics['salary'].astype('int').to_dict()
+        self.vacancies_year_count = year_statistics['vacancy_count'].to_dict()
+        self.__save_timing('year_statistics', started_at)
+
+    def __process_area_statistics(self, cube: pd.DataFrame):
+        """Рассчитывает среднюю зарплату, количество и доли вакансий по городам.
+
+        Args:
+            cube (pd.DataFrame): Куб вакансий
+        """
+        started_at = time.perf_counter()
+        area_statistics = DataSet.sum_statistics(cube, 'area_name', sort=False)
+        vacancies_area_count = area_statistics['vacancy_count'].sort_values(ascending=False)
         self.vacancies_area_count = vacancies_area_count.to_dict()
-        fractions = vacancies_area_count[vacancies_area_count * 100 / vacancies_area_count.sum() >= 1]\
-            .apply(lambda count: count / vacancies_area_count.sum()).head(10)
+        area_count = vacancies_area_count.sum()
+        fractions = (vacancies_area_count[vacancies_area_count * 100 / area_count >= 1] / area_count).head(10)
         self.fractions = fractions.to_dict()
-        vacancies_area_salaries = data.groupby('area_name')['salary'].mean()
+        vacancies_area_salaries = area_statistics['salary'].sort_index()
         vacancies_area_salaries = vacancies_area_salaries[vacancies_area_salaries.index.isin(fractions.index)] \
             .sort_values(ascending=False).head(10)
         self.vacancies_area_salaries = vacancies_area_salaries.astype('int').to_dict()
+        self.__save_timing('area_statistics', started_at)
+
+    def __save_timing(self, step: str, started_at: float):
+        """Сохраняет длительность шага расчета статистики.
+
+        Args:
+            step (str): Название шага
+            started_at (float): Время начала шага
+
+        Returns:
+            float: Время окончания шага
+        """
+        finished_at = time.perf_counter()
+        self.timings[step] = finished_at - started_at
+        return finished_at
+
+    def display_timings(self):
+        """Выводит длительность шагов расчета статистики."""
+        for step, duration in self.timings.items():
+            print(f'{step}: {duration:.3f} с')
 
 
 class InputConnect:
-    """Класс, используемый для обработки вводимых пользователем данных.
+    """Класс, используемый для обработки параметров командной строки.
+
+    Модули для графиков и pdf отчетов импортируются только в режимах вывода, которым они нужны,
+    поэтому в режиме console запуск не тратит время на их загрузку.
 
     Attributes:
         csv_filename (str): Имя csv файла с вакансиями
+        mode (str): Режим вывода: console, png или pdf
     """
 
+    output_modes = ['console', 'png', 'pdf']
+
     def display_statistics(self, dataset: DataSet):
         """Выводит статистику.
 
@@ -107,50 +336,334 @@ class InputConnect:
             return s
         return f'{s[:100]}...'
 
-    def __init__(self):
-        """Инициализирует экземпляр InputConnect."""
+    @staticmethod
+    def create_parser():
+        """Создает разбор параметров командной строки.
 
-        self.csv_filename = input('Введите название файла: ')
-        self.profession = input('Введите название профессии: ')
-        if self.csv_filename and self.profession:
-            try:
-                dataset = DataSet(self.csv_filename)
-            except StopIteration:
-                print('Пустой файл')
-            if not dataset.is_file_empty():
-                dataset.process_statistics(self.csv_filename, self.profession)
-                report = Report(dataset)
-                report.create_plots(self.profession)
-                report.create_pdf(self.profession)
-                self.display_statistics(dataset)
+        Returns:
+            argparse.ArgumentParser: Разбор параметров командной строки
+        """
+        parser = argparse.ArgumentParser(description='Статистика и отчеты по вакансиям для профессии.')
+        parser.add_argument('csv_filename', help='имя csv файла с вакансиями')
+        parser.add_argument('profession', nargs='?', help='название профессии')
+        parser.add_argument('--mode', choices=InputConnect.output_modes, default='pdf',
+                            help='console - только статистика, png - статистика и графики, '
+                                 'pdf - статистика, графики и pdf отчет (по умолчанию)')
+        parser.add_argument('--query', dest='queries', action='append', metavar='PROFESSION',
+                            help='профессия для пакетного создания отчетов, можно указать несколько раз')
+        parser.add_argument('--processes', type=int, default=1, help='количество процессов для рисования графиков')
+        parser.add_argument('--port', type=int, help='запустить сервис отчетов на указанном порту')
+        parser.add_argument('--output-dir', default='.', help='папка для графиков и pdf отчетов, по умолчанию текущая')
+        parser.add_argument('--profile', action='store_true', help='вывести время этапов расчета статистики')
+        parser.add_argument('--wkhtmltopdf', help='путь к wkhtmltopdf, по умолчанию переменная окружения '
+                                                  'WKHTMLTOPDF_PATH или поиск в PATH')
+        return parser
+
+    def __init__(self, argv: list = None):
+        """Инициализирует экземпляр InputConnect по параметрам командной строки.
+
+        Если указан --port, запускается сервис отчетов (см. ReportService). Если указаны профессии --query,
+        отчеты создаются для всех профессий за одно чтение файла. Иначе отчет создается для профессии
+        из позиционного параметра.
+
+        Args:
+            argv (list): Параметры командной строки, None - параметры из sys.argv
+        """
+        parser = InputConnect.create_parser()
+        args = parser.parse_args(argv)
+        self.csv_filename = args.csv_filename
+        self.mode = args.mode
+        self.output_dir = args.output_dir
+        Report.wkhtmltopdf_path = args.wkhtmltopdf
+        if args.port is not None:
+            from report_service import ReportService
+            ReportService(ReportQueries(self.csv_filename, args.processes), port=args.port).serve_forever()
+        elif args.queries is not None:
+            if args.profession is not None:
+                parser.error('профессия указывается либо позиционным параметром, либо в --query')
+            self.create_batch_reports(args.queries, args.processes)
+        elif args.profession is not None:
+            self.create_report(args.profession, args.profile)
+        else:
+            parser.error('не указана профессия')
+
+    def create_report(self, profession: str, profile: bool = False):
+        """Рассчитывает статистику и создает отчет для профессии.
+
+        Графики сохраняются в plots.png, pdf отчет - в report.pdf в папке output_dir,
+        если их требует режим вывода.
+
+        Args:
+            profession (str): Выбранная профессия
+            profile (bool): Вывести время этапов расчета статистики
+        """
+        try:
+            dataset = DataSet(self.csv_filename)
+        except StopIteration:
+            print('Пустой файл')
+            return
+        if dataset.is_file_empty():
+            return
+        dataset.process_statistics(self.csv_filename, profession, profile)
+        report = Report(dataset)
+        if self.mode != 'console':
+            os.makedirs(self.output_dir, exist_ok=True)
+            plots = report.create_plots(profession, os.path.join(self.output_dir, 'plots.png'))
+        if self.mode == 'pdf':
+            report.create_pdf(profession, plots, os.path.join(self.output_dir, 'report.pdf'))
+        self.display_statistics(dataset)
+
+    def create_batch_reports(self, queries: list, process_count: int = 1):
+        """Создает отчеты для нескольких профессий за одно чтение файла.
+
+        Отчет для профессии с номером n сохраняется в plots_n.png и report_n.pdf
+        в папке output_dir, если их требует режим вывода.
+        Графики берутся из кэша Report.plots_cache_directory, если их данные не изменились.
+
+        Args:
+            queries (list): Профессии
+            process_count (int): Количество процессов для рисования графиков
+        """
+        try:
+            dataset = DataSet(self.csv_filename)
+        except StopIteration:
+            print('Пустой файл')
+            return
+        if dataset.is_file_empty():
+            return
+        datasets = dataset.process_batch_statistics(self.csv_filename, queries)
+        reports = [Report(query_dataset) for query_dataset in datasets]
+        if self.mode != 'console':
+            plot_data = [report.get_plot_data(profession) for profession, report in zip(queries, reports)]
+            plots = Report.render_batch_plots(plot_data, process_count, Report.plots_cache_directory)
+            os.makedirs(self.output_dir, exist_ok=True)
+            for number, query_plots in enumerate(plots, 1):
+                with open(os.path.join(self.output_dir, f'plots_{number}.png'), 'wb') as plots_file:
+                    plots_file.write(query_plots)
+        for number, (profession, report, query_dataset) in enumerate(zip(queries, reports, datasets), 1):
+            if self.mode == 'pdf':
+                report.create_pdf(profession, plots[number - 1],
+                                  os.path.join(self.output_dir, f'report_{number}.pdf'))
+            print(f'Профессия: {profession}')
+            self.display_statistics(query_dataset)
 
 
 class Report:
-    """Класс, используемый для представления отчёта."""
+    """Класс, используемый для представления отчёта.
+
+    Attributes:
+        plots_version (int): Версия оформления графиков, при изменении графиков кэш становится недействительным
+        plots_cache_directory (str): Папка кэша графиков для пакетного создания отчетов
+        plots_cache_max_size (int): Максимальный размер кэша графиков в байтах, None - без ограничения
+        environment (Environment): Окружение jinja2, общее для всех отчетов процесса
+        wkhtmltopdf_path (str): Путь к wkhtmltopdf, None - путь из переменной окружения WKHTMLTOPDF_PATH
+            или поиск в PATH
+        pdf_configuration (pdfkit.configuration): Настройки pdfkit, общие для всех отчетов процесса
+    """
+
+    plots_version = 1
+    plots_cache_directory = 'plots_cache'
+    plots_cache_max_size = 64 * 1024 * 1024
+    environment = None
+    wkhtmltopdf_path = None
+    pdf_configuration = None
 
     def __init__(self, dataset: DataSet):
         self.__dataset = dataset
 
-    def create_plots(self, profession: str):
-        """Создаёт графики для выбранной профессии.
+    def create_plots(self, profession: str, plots_filename: str = 'plots.png', cache_directory: str = None):
+        """Создаёт графики для выбранной профессии и сохраняет их в файл.
+
+        Args:
+            profession (str): Выбранная профессия
+            plots_filename (str): Имя файла с графиками
+            cache_directory (str): Папка кэша графиков, None - не использовать кэш
+
+        Returns:
+            bytes: Графики в формате png
+        """
+        plots = Report.render_plots(self.get_plot_data(profession), cache_directory)
+        with open(plots_filename, 'wb') as plots_file:
+            plots_file.write(plots)
+        return plots
+
+    def get_plot_data(self, profession: str):
+        """Возвращает данные, по которым строятся графики.
 
         Args:
             profession (str): Выбранная профессия
+
+        Returns:
+            dict: Выбранная профессия и статистика, отображаемая на графиках
         """
-        fig, ((vacancies_year_salaries_plot, vacancies_year_count_plot),
-              (vacancies_area_salaries_plot, fractions_plot)) = plt.subplots(2, 2)
+        return {'profession': profession,
+                'vacancies_year_salaries': self.__dataset.vacancies_year_salaries,
+                'profession_salaries': self.__dataset.profession_salaries,
+                'vacancies_year_count': self.__dataset.vacancies_year_count,
+                'profession_count': self.__dataset.profession_count,
+                'vacancies_area_salaries': self.__dataset.vacancies_area_salaries,
+                'fractions': self.__dataset.fractions}
+
+    @staticmethod
+    def get_environment():
+        """Возвращает окружение jinja2, создавая его при первом вызове.
+
+        Окружение хранит скомпилированные шаблоны, поэтому шаблон отчета компилируется один раз за процесс.
+
+        Returns:
+            Environment: Окружение jinja2
+        """
+        if Report.environment is None:
+            from jinja2 import Environment, FileSystemLoader
+            Report.environment = Environment(loader=FileSystemLoader('.'))
+        return Report.environment
+
+    @staticmethod
+    def get_pdf_configuration():
+        """Возвращает настройки pdfkit, создавая их при первом вызове.
+
+        Путь к wkhtmltopdf берется из wkhtmltopdf_path, переменной окружения WKHTMLTOPDF_PATH
+        или ищется в PATH.
+
+        Returns:
+            pdfkit.configuration: Настройки pdfkit
+        """
+        if Report.pdf_configuration is None:
+            import pdfkit
+            path = Report.wkhtmltopdf_path or os.environ.get('WKHTMLTOPDF_PATH') or shutil.which('wkhtmltopdf')
+            if path is None:
+                raise FileNotFoundError('Не найден wkhtmltopdf: укажите путь в --wkhtmltopdf или WKHTMLTOPDF_PATH')
+            Report.pdf_configuration = pdfkit.configuration(wkhtmltopdf=path)
+        return Report.pdf_configuration
+
+    @staticmethod
+    def get_plot_data_hash(plot_data: dict):
+        """Возвращает хэш данных графиков, который используется как ключ кэша графиков.
+
+        Args:
+            plot_data (dict): Данные графиков
+
+        Returns:
+            str: Хэш sha256 данных графиков, версии графиков и версии matplotlib
+        """
+        import matplotlib
+        content = json.dumps([Report.plots_version, matplotlib.__version__, plot_data], ensure_ascii=False, default=str)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def draw_plots(plot_data: dict):
+        """Рисует графики в формате png.
+
+        Графики рисуются объектным API matplotlib на холсте Agg без глобального состояния pyplot,
+        поэтому несколько отчетов можно рисовать одновременно в разных процессах.
+
+        Args:
+            plot_data (dict): Данные графиков
+
+        Returns:
+            bytes: Графики в формате png
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ((vacancies_year_salaries_plot, vacancies_year_count_plot),
+         (vacancies_area_salaries_plot, fractions_plot)) = fig.subplots(2, 2)
         Report.create_vacancies_year_salaries_plot(vacancies_year_salaries_plot,
-                                                   self.__dataset.vacancies_year_salaries,
-                                                   self.__dataset.profession_salaries,
-                                                   profession)
+                                                   plot_data['vacancies_year_salaries'],
+                                                   plot_data['profession_salaries'],
+                                                   plot_data['profession'])
         Report.create_vacancies_year_count_plot(vacancies_year_count_plot,
-                                                self.__dataset.vacancies_year_count,
-                                                self.__dataset.profession_count,
-                                                profession)
-        Report.create_vacancies_area_salaries_plot(vacancies_area_salaries_plot, self.__dataset.vacancies_area_salaries)
-        Report.create_fractions_plot(fractions_plot, self.__dataset.fractions)
+                                                plot_data['vacancies_year_count'],
+                                                plot_data['profession_count'],
+                                                plot_data['profession'])
+        Report.create_vacancies_area_salaries_plot(vacancies_area_salaries_plot, plot_data['vacancies_area_salaries'])
+        Report.create_fractions_plot(fractions_plot, plot_data['fractions'])
         fig.tight_layout()
-        plt.savefig('plots.png')
+        plots_file = io.BytesIO()
+        fig.savefig(plots_file, format='png')
+        return plots_file.getvalue()
+
+    @staticmethod
+    def render_plots(plot_data: dict, cache_directory: str = None):
+        """Рисует графики или берет их из кэша.
+
+        Если указан cache_directory, графики ищутся в кэше по хэшу их данных
+        и рисуются заново, только если данные изменились. Размер кэша ограничивается plots_cache_max_size.
+
+        Args:
+            plot_data (dict): Данные графиков
+            cache_directory (str): Папка кэша графиков, None - не использовать кэш
+
+        Returns:
+            bytes: Графики в формате png
+        """
+        if cache_directory is None:
+            return Report.draw_plots(plot_data)
+        os.makedirs(cache_directory, exist_ok=True)
+        cached_filename = os.path.join(cache_directory, f'{Report.get_plot_data_hash(plot_data)}.png')
+        try:
+            with open(cached_filename, 'rb') as cached_file:
+                plots = cached_file.read()
+            os.utime(cached_filename)
+            return plots
+        except FileNotFoundError:
+            pass
+        plots = Report.draw_plots(plot_data)
+        temporary_filename = f'{cached_filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_filename, 'wb') as cached_file:
+            cached_file.write(plots)
+        os.replace(temporary_filename, cached_filename)
+        Report.evict_plots_cache(cache_directory)
+        return plots
+
+    @staticmethod
+    def evict_plots_cache(cache_directory: str):
+        """Удаляет давно не использованные графики, пока размер кэша превышает plots_cache_max_size.
+
+        Файлы, удаленные другим процессом во время очистки, пропускаются.
+
+        Args:
+            cache_directory (str): Папка кэша графиков
+        """
+        if Report.plots_cache_max_size is None:
+            return
+        cached_files = []
+        for entry in os.scandir(cache_directory):
+            if entry.name.endswith('.png'):
+                try:
+                    cached_files.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+                except FileNotFoundError:
+                    pass
+        total_size = sum(size for _, size, _ in cached_files)
+        for _, size, path in sorted(cached_files):
+            if total_size <= Report.plots_cache_max_size:
+                break
+            total_size -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def render_batch_plots(plot_data: list, process_count: int = 1, cache_directory: str = None):
+        """Рисует графики нескольких отчетов.
+
+        Если process_count больше 1, графики отчетов рисуются параллельно в пуле процессов.
+
+        Args:
+            plot_data (list): Данные графиков отчетов
+            process_count (int): Количество процессов
+            cache_directory (str): Папка кэша графиков, None - не использовать кэш
+
+        Returns:
+            list: Графики отчетов в формате png в порядке plot_data
+        """
+        render_plots = functools.partial(Report.render_plots, cache_directory=cache_directory)
+        if process_count > 1:
+            with multiprocessing.Pool(process_count) as pool:
+                return pool.map(render_plots, plot_data)
+        return [render_plots(query_plot_data) for query_plot_data in plot_data]
 
     @staticmethod
     def create_vacancies_year_salaries_plot(plot, vacancies_year_salaries: dict, profession_salaries: dict, profession: str):
@@ -253,15 +766,22 @@ class Report:
         else:
             return '-\n'.join(s.split('-'))
 
-    def create_pdf(self, profession: str):
-        """Создает pdf отчет.
+    def render_pdf(self, profession: str, plots: bytes):
+        """Создает pdf отчет в памяти.
+
+        Графики встраиваются в html отчета как data URI, поэтому wkhtmltopdf не читает файлы с диска,
+        а pdf отчет возвращается без записи во временный файл.
 
         Args:
             profession (str): Выбранная профессия
+            plots (bytes): Графики в формате png
+
+        Returns:
+            bytes: Содержимое pdf отчета
         """
-        env = Environment(loader=FileSystemLoader('.'))
-        report_template = env.get_template('report_template.html')
-        img_path = f"file:///{os.path.abspath('plots.png')}"
+        import pdfkit
+        report_template = Report.get_environment().get_template('report_template.html')
+        img_path = f"data:image/png;base64,{base64.b64encode(plots).decode('ascii')}"
         pdf_template = report_template.render(
             {'profession': profession, "img_path": img_path,
              'vacancies_year_salaries': self.__dataset.vacancies_year_salaries,
@@ -269,10 +789,95 @@ class Report:
              'vacancies_year_count': self.__dataset.vacancies_year_count,
              'profession_count': self.__dataset.profession_count,
              'vacancies_area_salaries': self.__dataset.vacancies_area_salaries, 'fractions': self.__dataset.fractions})
-        path_to_wkhtmltopdf = r'C:\Users\alexa\PycharmProjects\pythonProject2\wkhtmltox\bin\wkhtmltopdf.exe'
-        config = pdfkit.configuration(wkhtmltopdf=path_to_wkhtmltopdf)
-        pdfkit.from_string(pdf_template, 'report.pdf', configuration=config,
-                           options={'enable-local-file-access': None})
+        return pdfkit.from_string(pdf_template, False, configuration=Report.get_pdf_configuration())
+
+    def create_pdf(self, profession: str, plots: bytes, report_filename: str = 'report.pdf'):
+        """Создает pdf отчет.
+
+        Args:
+            profession (str): Выбранная профессия
+            plots (bytes): Графики в формате png
+            report_filename (str): Имя pdf файла отчета
+        """
+        with open(report_filename, 'wb') as report_file:
+            report_file.write(self.render_pdf(profession, plots))
+
+
+class ReportQueries:
+    """Класс, используемый для ответов на запросы сервиса отчетов по загруженным заранее данным.
+
+    Куб вакансий и общая статистика загружаются один раз и перечитываются, только когда csv файл изменился.
+    Графики рисуются в общем для всех запросов пуле процессов, а без пула - в потоке запроса
+    по одному, так как matplotlib не рассчитан на одновременное рисование из нескольких потоков.
+
+    Attributes:
+        csv_filename (str): Имя csv файла с вакансиями
+        process_count (int): Количество процессов для рисования графиков
+        required_params (list): Обязательные параметры запроса
+    """
+
+    required_params = ['profession']
+
+    def __init__(self, csv_filename: str, process_count: int = 1):
+        """Инициализирует экземпляр ReportQueries.
+
+        Args:
+            csv_filename (str): Имя csv файла с вакансиями
+            process_count (int): Количество процессов для рисования графиков
+        """
+        self.csv_filename = csv_filename
+        self.process_count = process_count
+        self.__lock = threading.Lock()
+        self.__render_lock = threading.Lock()
+        self.__dataset = None
+        self.__source_state = None
+        self.__pool = multiprocessing.Pool(process_count) if process_count > 1 else None
+
+    def get_dataset(self):
+        """Возвращает данные вакансий с общей статистикой, перечитывая их после изменения csv файла.
+
+        Returns:
+            DataSet: Данные вакансий
+        """
+        source_stat = os.stat(self.csv_filename)
+        source_state = (source_stat.st_size, source_stat.st_mtime_ns)
+        with self.__lock:
+            if self.__source_state != source_state:
+                dataset = DataSet(self.csv_filename)
+                dataset.prepare_statistics(self.csv_filename)
+                self.__dataset, self.__source_state = dataset, source_state
+            return self.__dataset
+
+    def get_statistics(self, params: dict):
+        """Возвращает статистику для запроса.
+
+        Args:
+            params (dict): Параметры запроса profession
+
+        Returns:
+            dict: Статистика, отображаемая в отчете
+        """
+        dataset = self.get_dataset().get_query_statistics([params['profession']])[0]
+        return Report(dataset).get_plot_data(params['profession'])
+
+    def create_report(self, params: dict):
+        """Создает pdf отчет для запроса.
+
+        Args:
+            params (dict): Параметры запроса profession
+
+        Returns:
+            bytes: Содержимое pdf отчета
+        """
+        report = Report(self.get_dataset().get_query_statistics([params['profession']])[0])
+        plot_data = report.get_plot_data(params['profession'])
+        if self.__pool is None:
+            with self.__render_lock:
+                plots = Report.render_plots(plot_data, Report.plots_cache_directory)
+        else:
+            plots = self.__pool.apply(Report.render_plots, (plot_data, Report.plots_cache_directory))
+        return report.render_pdf(params['profession'], plots)
 
 
-InputConnect()
+if __name__ == '__main__':
+    InputConnect()
@@ -1,43 +1,335 @@
+import argparse
+import hashlib
+import io
+import os
 import pandas as pd
-import xmltodict
 import requests
-import sqlite3
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from requests.adapters import HTTPAdapter
+from xml.etree import ElementTree
+
+from exchange_rate_store import ExchangeRateStore
+
+
+class TokenBucket:
+    """Класс, используемый для ограничения частоты запросов по алгоритму token bucket.
+
+    Attributes:
+        rate (float): Количество токенов, добавляемых в секунду
+        capacity (float): Максимальное количество накопленных токенов
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """Инициализирует экземпляр TokenBucket.
+
+        Args:
+            rate (float): Количество токенов, добавляемых в секунду
+            capacity (float): Максимальное количество накопленных токенов
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.__tokens = capacity
+        self.__updated_at = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """Забирает один токен, при необходимости дожидаясь его появления."""
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated_at) * self.rate)
+            self.__updated_at = now
+            self.__tokens -= 1
+            wait = -self.__tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """Класс, используемый для хранения ответов сервера на диске.
+
+    Ответы хранятся в каталоге objects под именем, равным хэшу их содержимого, поэтому одинаковые
+    ответы на разные даты хранятся один раз. Каталог refs связывает дату запроса с хэшем ответа.
+    Ответы за прошедшие месяцы не устаревают, ответы за текущий и будущие месяцы устаревают через ttl секунд.
+
+    Attributes:
+        directory (str): Каталог кэша
+        ttl (float): Время жизни ответов за текущий месяц в секундах
+        max_size (int): Максимальный размер ответов в байтах, None - без ограничения
+        offline (bool): Не обращаться к серверу, использовать только кэш
+    """
+
+    def __init__(self, directory: str, ttl: float = 3600, max_size: int = None, offline: bool = False):
+        """Инициализирует экземпляр ResponseCache.
+
+        Args:
+            directory (str): Каталог кэша
+            ttl (float): Время жизни ответов за текущий месяц в секундах
+            max_size (int): Максимальный размер ответов в байтах, None - без ограничения
+            offline (bool): Не обращаться к серверу, использовать только кэш
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self.__lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'refs'), exist_ok=True)
+
+    def is_fresh(self, request_date: date, saved_at: float):
+        """Возвращает True, если ответ на запрос за указанную дату еще не устарел.
+
+        Args:
+            request_date (date): Дата запроса
+            saved_at (float): Время сохранения ответа
+
+        Returns:
+            bool: True, если ответ не устарел
+        """
+        today = date.today()
+        if (request_date.year, request_date.month) < (today.year, today.month):
+            return True
+        return time.time() - saved_at < self.ttl
+
+    def get(self, request_date: date):
+        """Возвращает сохраненный ответ на запрос за указанную дату.
+
+        В режиме offline устаревший ответ тоже возвращается, так как получить новый ответ нельзя.
+
+        Args:
+            request_date (date): Дата запроса
+
+        Returns:
+            bytes: Ответ сервера, None - если ответа нет или он устарел (кроме режима offline)
+        """
+        ref_path = os.path.join(self.directory, 'refs', request_date.isoformat())
+        try:
+            with open(ref_path, 'r') as ref:
+                object_path = os.path.join(self.directory, 'objects', ref.read())
+            if not self.offline and not self.is_fresh(request_date, os.path.getmtime(ref_path)):
+                return None
+            with open(object_path, 'rb') as response:
+                content = response.read()
+            os.utime(object_path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, request_date: date, content: bytes):
+        """Сохраняет ответ на запрос за указанную дату.
+
+        Args:
+            request_date (date): Дата запроса
+            content (bytes): Ответ сервера
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = os.path.join(self.directory, 'objects', digest)
+        ref_path = os.path.join(self.directory, 'refs', request_date.isoformat())
+        with self.__lock:
+            for path, data, mode in ((object_path, content, 'wb'), (ref_path, digest, 'w')):
+                with open(f'{path}.tmp', mode) as file:
+                    file.write(data)
+                os.replace(f'{path}.tmp', path)
+            self.evict()
+
+    def evict(self):
+        """Удаляет давно не использованные ответы, пока их размер превышает max_size."""
+        if self.max_size is None:
+            return
+        objects_directory = os.path.join(self.directory, 'objects')
+        objects = [entry for entry in os.scandir(objects_directory) if not entry.name.endswith('.tmp')]
+        total_size = sum(entry.stat().st_size for entry in objects)
+        for entry in sorted(objects, key=lambda entry: entry.stat().st_mtime):
+            if total_size <= self.max_size:
+                break
+            total_size -= entry.stat().st_size
+            os.remove(entry.path)
 
 
 class ExchangeRateParser:
-    """Класс, используемый для представления парсера курсов валют."""
+    """Класс, используемый для представления парсера курсов валют.
+
+    Attributes:
+        currencies (list): Валюты, курсы которых сохраняются по умолчанию
+        url (str): Адрес сервиса курсов валют
+    """
 
     currencies = ['BYR', 'USD', 'EUR', 'KZT', 'UAH', 'AZN', 'KGS', 'UZS']
+    url = 'https://www.cbr.ru/scripts/XML_daily.asp'
 
     @staticmethod
-    def fetch_exchange_rate_per_year_month(year: int, month: int):
-        """Парсит курс валют в указанный месяц и год.
+    def create_session(pool_size: int):
+        """Создает HTTP сессию с пулом постоянных соединений.
 
         Args:
-            year (int): Год
-            month (int): Месяц
+            pool_size (int): Максимальное количество соединений в пуле
 
         Returns:
-            dict: Курсы валют в указанный месяц и год
+            requests.Session: HTTP сессия
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @staticmethod
+    def parse_exchange_rate(content: bytes, currencies: list = None):
+        """Парсит курсы валют из ответа сервера.
+
+        Документ читается потоково, элементы Valute разбираются по мере чтения и сразу удаляются.
+        Чтение прекращается, как только найдены все валюты из currencies.
+
+        Args:
+            content (bytes): Ответ сервера в формате XML
+            currencies (list): Валюты, None - ExchangeRateParser.currencies
+
+        Returns:
+            dict: Курсы валют
         """
+        currencies = ExchangeRateParser.currencies if currencies is None else currencies
         exchange_rate = {}
-        date = f'01/{str(month).zfill(2)}/{year}'
-        url = f'https://www.cbr.ru/scripts/XML_daily.asp?date_req={date}&d=0'
-        resp = requests.get(url)
-        resp.close()
-        valutes = xmltodict.parse(resp.content)['ValCurs']['Valute']
-        for val in valutes:
-            if val['CharCode'] in ExchangeRateParser.currencies:
-                value = val['Value'].replace(',', '.')
-                nominal = val['Nominal'].replace(',', '.')
-                exchange_rate[val['CharCode']] = round(float(value) / float(nominal), 8)
-        for currency in ExchangeRateParser.currencies:
+        for _, element in ElementTree.iterparse(io.BytesIO(content)):
+            if element.tag != 'Valute':
+                continue
+            char_code = element.findtext('CharCode')
+            if char_code in currencies:
+                value = element.findtext('Value').replace(',', '.')
+                nominal = element.findtext('Nominal').replace(',', '.')
+                exchange_rate[char_code] = round(float(value) / float(nominal), 8)
+                if len(exchange_rate) == len(currencies):
+                    break
+            element.clear()
+        for currency in currencies:
             if currency not in exchange_rate:
                 exchange_rate[currency] = None
         return exchange_rate
 
+    @staticmethod
+    def fetch_exchange_rate_per_year_month(year: int, month: int, session: requests.Session = None,
+                                           cache: ResponseCache = None, rate_limiter: TokenBucket = None,
+                                           currencies: list = None):
+        """Парсит курс валют в указанный месяц и год.
+
+        Args:
+            year (int): Год
+            month (int): Месяц
+            session (requests.Session): HTTP сессия, None - отдельный запрос без сессии
+            cache (ResponseCache): Кэш ответов сервера, None - без кэша
+            rate_limiter (TokenBucket): Ограничитель частоты запросов к серверу, None - без ограничения
+            currencies (list): Валюты, None - ExchangeRateParser.currencies
+
+        Returns:
+            dict: Курсы валют в указанный месяц и год
+        """
+        return ExchangeRateParser.fetch_exchange_rate_per_date(date(year, month, 1), session, cache, rate_limiter,
+                                                               currencies)
+
+    @staticmethod
+    def fetch_exchange_rate_per_date(request_date: date, session: requests.Session = None,
+                                     cache: ResponseCache = None, rate_limiter: TokenBucket = None,
+                                     currencies: list = None):
+        """Парсит курс валют на указанную дату.
+
+        Args:
+            request_date (date): Дата
+            session (requests.Session): HTTP сессия, None - отдельный запрос без сессии
+            cache (ResponseCache): Кэш ответов сервера, None - без кэша
+            rate_limiter (TokenBucket): Ограничитель частоты запросов к серверу, None - без ограничения
+            currencies (list): Валюты, None - ExchangeRateParser.currencies
+
+        Returns:
+            dict: Курсы валют на указанную дату
+        """
+        content = None if cache is None else cache.get(request_date)
+        if content is None:
+            if cache is not None and cache.offline:
+                raise FileNotFoundError(f'Нет сохраненного ответа за {request_date}')
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            url = f'{ExchangeRateParser.url}?date_req={request_date.strftime("%d/%m/%Y")}&d=0'
+            resp = (session or requests).get(url)
+            resp.close()
+            resp.raise_for_status()
+            content = resp.content
+            if cache is not None:
+                cache.put(request_date, content)
+        return ExchangeRateParser.parse_exchange_rate(content, currencies)
+
+    @staticmethod
+    def fetch_exchange_rate_with_retry(request_date: date, session: requests.Session, rate_limiter: TokenBucket,
+                                       retries: int, backoff: float, cache: ResponseCache = None,
+                                       currencies: list = None):
+        """Парсит курс валют на указанную дату, повторяя запрос при ошибках.
+
+        Перед каждым запросом к серверу ожидается токен rate_limiter, а между попытками
+        выдерживается пауза backoff, удваивающаяся с каждой попыткой.
+
+        Args:
+            request_date (date): Дата
+            session (requests.Session): HTTP сессия
+            rate_limiter (TokenBucket): Ограничитель частоты запросов
+            retries (int): Количество повторных попыток
+            backoff (float): Пауза перед первой повторной попыткой в секундах
+            cache (ResponseCache): Кэш ответов сервера, None - без кэша
+            currencies (list): Валюты, None - ExchangeRateParser.currencies
+
+        Returns:
+            dict: Курсы валют на указанную дату
+        """
+        for attempt in range(retries + 1):
+            try:
+                return ExchangeRateParser.fetch_exchange_rate_per_date(request_date, session, cache, rate_limiter,
+                                                                       currencies)
+            except requests.RequestException:
+                if attempt == retries:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+
+    @staticmethod
+    def fetch_exchange_rates(dates: list, max_workers: int = 8, requests_per_second: float = 20,
+                             retries: int = 3, backoff: float = 0.5, cache: ResponseCache = None,
+                             currencies: list = None):
+        """Параллельно парсит курсы валют на несколько дат.
+
+        Запросы выполняются в пуле из max_workers потоков через общую сессию с постоянными соединениями,
+        а их частота ограничивается requests_per_second.
+
+        Args:
+            dates (list): Даты
+            max_workers (int): Максимальное количество одновременных запросов
+            requests_per_second (float): Максимальное количество запросов в секунду
+            retries (int): Количество повторных попыток для каждой даты
+            backoff (float): Пауза перед первой повторной попыткой в секундах
+            cache (ResponseCache): Кэш ответов сервера, None - без кэша
+            currencies (list): Валюты, None - ExchangeRateParser.currencies
+
+        Returns:
+            list: Курсы валют для каждой даты в порядке dates
+        """
+        rate_limiter = TokenBucket(requests_per_second)
+        with ExchangeRateParser.create_session(max_workers) as session, ThreadPoolExecutor(max_workers) as executor:
+            return list(executor.map(
+                lambda request_date: ExchangeRateParser.fetch_exchange_rate_with_retry(
+                    request_date, session, rate_limiter, retries, backoff, cache, currencies),
+                dates))
+
+    @staticmethod
+    def get_year_month_list(begin: datetime, end: datetime):
+        """Возвращает список пар из года и месяца между указанными датами, включая месяцы начальной и конечной дат.
+
+        Args:
+            begin (datetime): Начальная дата
+            end (datetime): Конечная дата
+
+        Returns:
+            list: Список пар из года и месяца
+        """
+        return [(year, month) for year in range(begin.year, end.year + 1) for month in range(1, 12 + 1)
+                if (begin.year, begin.month) <= (year, month) <= (end.year, end.month)]
+
     @staticmethod
     def get_month_range_list(begin: datetime, end: datetime):
         """Возвращает список, состоящий из дат с промежутком в 1 месяц между указанными датами.
@@ -49,36 +341,82 @@ class ExchangeRateParser:
         Returns:
             list: Список дат
         """
-        dates = []
-        for year in range(begin.year, end.year + 1):
-            for month in range(1, 12 + 1):
-                dates.append(f'{year}-{str(month).zfill(2)}')
-        return dates
+        return [f'{year}-{str(month).zfill(2)}' for year, month in ExchangeRateParser.get_year_month_list(begin, end)]
 
     @staticmethod
-    def parse_to_database(begin: datetime, end: datetime, result_filename):
-        """Парсит курсы валют между указанными датами в базу данных.
+    def parse_to_database(begin: datetime, end: datetime, result_filename, max_workers: int = 8,
+                          requests_per_second: float = 20, incremental: bool = False, cache: ResponseCache = None,
+                          currencies: list = None):
+        """Парсит курсы валют между указанными датами в таблицу exchange_rates базы данных.
+
+        Сохраняются курсы валют из currencies. В режиме incremental загружаются только месяцы
+        после последнего сохраненного курса. Без него все сохраненные курсы этих валют заменяются.
+        Курсы других валют в базе данных не изменяются.
 
         Args:
             begin (datetime): Начальная дата
             end (datetime): Конечная дата
             result_filename (str): Имя файла базы данных
+            max_workers (int): Максимальное количество одновременных запросов
+            requests_per_second (float): Максимальное количество запросов в секунду
+            incremental (bool): Загрузить только отсутствующие месяцы
+            cache (ResponseCache): Кэш ответов сервера, None - без кэша
+            currencies (list): Валюты, None - ExchangeRateParser.currencies
         """
-        currencies = {}
-        for year in range(begin.year, end.year + 1):
-            for month in range(1, 12 + 1):
-                exchange_rate = ExchangeRateParser.fetch_exchange_rate_per_year_month(year, month)
-                time.sleep(0.05)
-                for currency in exchange_rate:
-                    if currency not in currencies:
-                        currencies[currency] = []
-                    currencies[currency].append(exchange_rate[currency])
+        currencies = ExchangeRateParser.currencies if currencies is None else currencies
+        store = ExchangeRateStore(result_filename)
+        latest_date = store.get_latest_date() if incremental else None
+        if latest_date is not None:
+            latest_date = datetime.strptime(latest_date, '%Y-%m')
+            begin = max(begin, datetime(latest_date.year + latest_date.month // 12, latest_date.month % 12 + 1, 1))
+        year_months = ExchangeRateParser.get_year_month_list(begin, end)
+        if not year_months:
+            return
+        currency_rates = {}
+        exchange_rates = ExchangeRateParser.fetch_exchange_rates([date(year, month, 1) for year, month in year_months],
+                                                                 max_workers, requests_per_second, cache=cache,
+                                                                 currencies=currencies)
+        for exchange_rate in exchange_rates:
+            for currency in exchange_rate:
+                if currency not in currency_rates:
+                    currency_rates[currency] = []
+                currency_rates[currency].append(exchange_rate[currency])
         date_index = ExchangeRateParser.get_month_range_list(begin, end)
-        data = pd.DataFrame(currencies, index=date_index)
+        data = pd.DataFrame(currency_rates, index=date_index)
+        data.index.name = 'date'
+        store.write(data, replace=latest_date is None, currencies=currencies)
+
+    @staticmethod
+    def parse_daily_to_database(begin: datetime, end: datetime, result_filename, max_workers: int = 8,
+                                requests_per_second: float = 20, cache: ResponseCache = None,
+                                currencies: list = None):
+        """Парсит ежедневные курсы валют между указанными датами в таблицу exchange_rates_daily базы данных.
+
+        Дата в таблице хранится в формате YYYY-MM-DD, все сохраненные курсы валют из currencies заменяются.
+
+        Args:
+            begin (datetime): Начальная дата
+            end (datetime): Конечная дата
+            result_filename (str): Имя файла базы данных
+            max_workers (int): Максимальное количество одновременных запросов
+            requests_per_second (float): Максимальное количество запросов в секунду
+            cache (ResponseCache): Кэш ответов сервера, None - без кэша
+            currencies (list): Валюты, None - ExchangeRateParser.currencies
+        """
+        currencies = ExchangeRateParser.currencies if currencies is None else currencies
+        dates = list(pd.date_range(begin.date(), end.date(), freq='D').date)
+        exchange_rates = ExchangeRateParser.fetch_exchange_rates(dates, max_workers, requests_per_second, cache=cache,
+                                                                 currencies=currencies)
+        data = pd.DataFrame(exchange_rates, index=[request_date.isoformat() for request_date in dates])
         data.index.name = 'date'
-        cnx = sqlite3.connect(result_filename)
-        data.to_sql('currencies', cnx)
-        cnx.close()
+        ExchangeRateStore(result_filename, ExchangeRateStore.daily_table).write(data, replace=True,
+                                                                                currencies=currencies)
 
 
-ExchangeRateParser.parse_to_database(datetime(2003, 1, 1), datetime(2022, 12, 31), 'currencies.sqlite')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Загрузка курсов валют ЦБ РФ по месяцам в currencies.sqlite.')
+    parser.add_argument('--currencies', nargs='+', type=str.upper, default=ExchangeRateParser.currencies,
+                        metavar='CODE', help='коды валют, по умолчанию ' + ' '.join(ExchangeRateParser.currencies))
+    args = parser.parse_args()
+    ExchangeRateParser.parse_to_database(datetime(2003, 1, 1), datetime(2022, 12, 31), 'currencies.sqlite',
+                                         currencies=args.currencies)
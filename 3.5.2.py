@@ -1,22 +1,94 @@
 import csv
 import datetime
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+import re
 import sqlite3
 
+import numpy as np
 import pandas as pd
 
+from exchange_rate_store import ExchangeRateStore
+
 
 class ExchangeRateConverter:
-    """Класс, используемый для представления конвертатора курсов валют."""
+    """Класс, используемый для представления конвертатора курсов валют.
+
+    Конвертатор поддерживает все валюты, курсы которых есть в базе данных.
+    """
 
-    currencies = {'BYR', 'USD', 'EUR', 'KZT', 'UAH', 'AZN', 'KGS', 'UZS'}
+    shard_converter = None
+    published_at_pattern = re.compile(r'\d{4}-(0[1-9]|1[0-2])-\d{2}T\d{2}:\d{2}:\d{2}[+-]\d{4}')
 
-    def __init__(self, exchange_rate_db_filename: str):
+    def __init__(self, exchange_rate_db_filename: str, daily: bool = False):
         """Инициализирует экземпляр ExchangeRateConverter.
 
         Args:
             exchange_rate_db_filename (str): Имя файла базы данных
+            daily (bool): Переводить зарплаты вакансий по последнему курсу на дату публикации
+                из таблицы exchange_rates_daily вместо курса на начало месяца
+        """
+        self.exchange_rate_db_filename = exchange_rate_db_filename
+        self.daily = daily
+        self.exchange_rate_table = None
+        self.exchange_rate_first_month = 0
+        self.currency_columns = {}
+        self.daily_exchange_rate_table = None
+        self.daily_exchange_rate_dates = None
+        self.daily_currency_columns = {}
+
+    @staticmethod
+    def get_month_offset(year: int, month: int):
+        """Возвращает порядковый номер месяца, начиная с нулевого года.
+
+        Args:
+            year (int): Год
+            month (int): Месяц
+
+        Returns:
+            int: Номер месяца
+        """
+        return int(year) * 12 + int(month) - 1
+
+    def load_exchange_rate(self):
+        """Загружает курсы валют по месяцам из базы данных в память.
+
+        Курсы хранятся в массиве NumPy, строки которого соответствуют месяцам подряд,
+        начиная с самого раннего месяца в базе, а столбцы - валютам.
+        Отсутствующие курсы хранятся как NaN.
+        """
+        dates, currencies, rates = ExchangeRateStore(self.exchange_rate_db_filename).load_matrix()
+        self.currency_columns = {currency: i for i, currency in enumerate(currencies)}
+        month_offsets = np.array([ExchangeRateConverter.get_month_offset(*date.split('-')) for date in dates],
+                                 dtype='int64')
+        self.exchange_rate_first_month = int(month_offsets.min()) if len(month_offsets) else 0
+        month_count = int(month_offsets.max()) - self.exchange_rate_first_month + 1 if len(month_offsets) else 0
+        self.exchange_rate_table = np.full((month_count, len(currencies)), np.nan)
+        self.exchange_rate_table[month_offsets - self.exchange_rate_first_month] = rates
+
+    def load_daily_exchange_rate(self):
+        """Загружает курсы валют по дням из базы данных в память.
+
+        Даты хранятся в отсортированном массиве numpy.datetime64, курсы - в массиве NumPy,
+        строки которого соответствуют датам, а столбцы - валютам. Отсутствующие курсы хранятся как NaN.
         """
-        self.exchange_rate = sqlite3.connect(exchange_rate_db_filename)
+        dates, currencies, rates = ExchangeRateStore(self.exchange_rate_db_filename,
+                                                     ExchangeRateStore.daily_table).load_matrix()
+        self.daily_currency_columns = {currency: i for i, currency in enumerate(currencies)}
+        self.daily_exchange_rate_dates = np.asarray(dates, dtype='datetime64[D]')
+        self.daily_exchange_rate_table = rates
+
+    def invalidate_exchange_rate(self):
+        """Сбрасывает загруженные курсы валют.
+
+        Следующий запрос курса заново загрузит их из базы данных.
+        Используется после обновления базы данных с курсами.
+        """
+        self.exchange_rate_table = None
+        self.daily_exchange_rate_table = None
 
     def get_exchange_rate(self, currency: str, year: int, month: int):
         """Возвращает курс валюты в указанный месяц и год.
@@ -29,15 +101,17 @@ class ExchangeRateConverter:
         Returns:
             float: Курс указанной валюты
         """
-        if currency not in ExchangeRateConverter.currencies:
+        if self.exchange_rate_table is None:
+            self.load_exchange_rate()
+        if currency not in self.currency_columns:
+            return None
+        row = ExchangeRateConverter.get_month_offset(year, month) - self.exchange_rate_first_month
+        if not 0 <= row < len(self.exchange_rate_table):
             return None
-        cur = self.exchange_rate.cursor()
-        date = f"{year}-{str(month).zfill(2)}"
-        sql = f"SELECT {currency} FROM currencies WHERE date = '{date}'"
-        cur.execute(sql)
-        rate = cur.fetchone()
-        cur.close()
-        return rate[0]
+        rate = self.exchange_rate_table[row, self.currency_columns[currency]]
+        if np.isnan(rate):
+            return None
+        return float(rate)
 
     def convert_to_rubles_per_month_year(self, amount: float, currency: str, year: int, month: int):
         """Переводит валюту в рубли.
@@ -58,44 +132,391 @@ class ExchangeRateConverter:
             return None
         return int(amount * rate)
 
-    def process_vacancies_file(self, vacancies_filename: str, result_filename: str):
+    def convert_to_rubles_batch(self, amounts, currencies, years, months):
+        """Переводит массивы сумм в рубли за один векторный вызов.
+
+        Args:
+            amounts: Кол-во валюты
+            currencies: Валюты
+            years: Годы
+            months: Месяцы
+
+        Returns:
+            np.ndarray: Рубли (NaN, если валюта неизвестна или курс отсутствует)
+        """
+        if self.exchange_rate_table is None:
+            self.load_exchange_rate()
+        rows = np.asarray(years, dtype='int64') * 12 + np.asarray(months, dtype='int64') - 1 \
+            - self.exchange_rate_first_month
+        return ExchangeRateConverter.gather_rubles(self.exchange_rate_table, self.currency_columns,
+                                                   rows, amounts, currencies)
+
+    def convert_to_rubles_batch_as_of(self, amounts, currencies, dates):
+        """Переводит массивы сумм в рубли по последнему курсу на указанные даты за один векторный вызов.
+
+        Для каждой даты берется курс из последней строки таблицы exchange_rates_daily с датой не позже указанной,
+        строка находится двоичным поиском по отсортированному массиву дат.
+
+        Args:
+            amounts: Кол-во валюты
+            currencies: Валюты
+            dates: Даты в формате YYYY-MM-DD
+
+        Returns:
+            np.ndarray: Рубли (NaN, если валюта неизвестна или курс отсутствует)
+        """
+        if self.daily_exchange_rate_table is None:
+            self.load_daily_exchange_rate()
+        rows = np.searchsorted(self.daily_exchange_rate_dates, np.asarray(dates, dtype='datetime64[D]'),
+                               side='right') - 1
+        return ExchangeRateConverter.gather_rubles(self.daily_exchange_rate_table, self.daily_currency_columns,
+                                                   rows, amounts, currencies)
+
+    @staticmethod
+    def gather_rubles(exchange_rate_table: np.ndarray, currency_columns: dict, rows, amounts, currencies):
+        """Переводит суммы в рубли по курсам из указанных строк таблицы курсов.
+
+        Args:
+            exchange_rate_table (np.ndarray): Таблица курсов
+            currency_columns (dict): Номера столбцов таблицы курсов для валют
+            rows: Номера строк таблицы курсов
+            amounts: Кол-во валюты
+            currencies: Валюты
+
+        Returns:
+            np.ndarray: Рубли (NaN, если валюта неизвестна или курс отсутствует)
+        """
+        amounts = np.asarray(amounts, dtype='float64')
+        currencies = np.asarray(currencies, dtype=object)
+        unique_currencies, currency_codes = np.unique(currencies, return_inverse=True)
+        columns = np.array([currency_columns.get(currency, -1) for currency in unique_currencies],
+                           dtype='int64')[currency_codes.reshape(-1)]
+        found = (columns >= 0) & (rows >= 0) & (rows < len(exchange_rate_table))
+        rates = np.full(len(amounts), np.nan)
+        rates[found] = exchange_rate_table[rows[found], columns[found]]
+        rubles = np.trunc(amounts * rates)
+        is_rur = currencies == 'RUR'
+        rubles[is_rur] = np.trunc(amounts[is_rur])
+        return rubles
+
+    @staticmethod
+    def parse_published_at(published_at: str):
+        """Возвращает год и месяц публикации вакансии.
+
+        Для строк вида 2022-07-05T18:19:30+0300 год и месяц берутся по позициям,
+        а сама строка возвращается без изменений. Остальные строки разбираются через strptime.
+
+        Args:
+            published_at (str): Дата публикации
+
+        Returns:
+            tuple: Год, месяц и дата публикации для записи в базу данных
+        """
+        if ExchangeRateConverter.published_at_pattern.fullmatch(published_at):
+            return int(published_at[:4]), int(published_at[5:7]), published_at
+        date = datetime.datetime.strptime(published_at, '%Y-%m-%dT%H:%M:%S%z')
+        return date.year, date.month, date.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    def convert_vacancies_block(self, lines: list):
+        """Переводит зарплаты блока строк csv файла в рубли.
+
+        Args:
+            lines (list): Строки csv файла с вакансиями
+
+        Returns:
+            list: Строки для записи в базу данных
+        """
+        if not lines:
+            return []
+        names, salaries_from, salaries_to, salary_currencies, areas = list(zip(*lines))[:5]
+        years, months, published_at = \
+            zip(*(ExchangeRateConverter.parse_published_at(line[5]) for line in lines))
+        salaries_from = np.array([salary or 'nan' for salary in salaries_from]).astype('float64')
+        salaries_to = np.array([salary or 'nan' for salary in salaries_to]).astype('float64')
+        amounts = np.where(np.isnan(salaries_from), salaries_to,
+                           np.where(np.isnan(salaries_to), salaries_from, (salaries_from + salaries_to) / 2))
+        if self.daily:
+            publish_dates = [date[:10] for date in published_at]
+            rubles = self.convert_to_rubles_batch_as_of(amounts, salary_currencies, publish_dates)
+        else:
+            rubles = self.convert_to_rubles_batch(amounts, salary_currencies, years, months)
+        is_missing = np.isnan(rubles)
+        salaries = np.where(is_missing, 0, rubles).astype('int64').astype(object)
+        salaries[is_missing] = None
+        return [[name, salary, area, date, year, f'{year}-{str(month).zfill(2)}']
+                for name, salary, area, date, year, month in zip(names, salaries, areas, published_at, years, months)]
+
+    def convert_vacancies_lines(self, reader, block_size: int):
+        """Переводит строки csv файла в рубли блоками по block_size строк.
+
+        Args:
+            reader: Reader для чтения строк csv файла
+            block_size (int): Количество строк, переводимых в рубли за один вызов
+
+        Yields:
+            list: Строка для записи в базу данных
+        """
+        while True:
+            lines = list(itertools.islice(reader, block_size))
+            if not lines:
+                return
+            yield from self.convert_vacancies_block(lines)
+
+    @staticmethod
+    def split_vacancies_file(vacancies_filename: str, shard_count: int):
+        """Разбивает файл с вакансиями на диапазоны байт, границы которых совпадают с началом строк.
+
+        Поля csv файла не должны содержать переносов строк.
+
+        Args:
+            vacancies_filename (str): Имя файла с вакансиями
+            shard_count (int): Желаемое количество диапазонов
+
+        Returns:
+            list: Начало и конец каждого диапазона в байтах, без строки заголовков
+        """
+        with open(vacancies_filename, 'rb') as vacancies:
+            vacancies.readline()
+            begin = vacancies.tell()
+            end = os.path.getsize(vacancies_filename)
+            bounds = [begin]
+            for i in range(1, shard_count):
+                vacancies.seek(max(begin + (end - begin) * i // shard_count - 1, bounds[-1]))
+                vacancies.readline()
+                bounds.append(min(vacancies.tell(), end))
+            bounds.append(end)
+        return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if start < stop]
+
+    @staticmethod
+    def init_shard_converter(exchange_rate_db_filename: str, daily: bool):
+        """Создает конвертатор с собственной таблицей курсов для процесса-обработчика.
+
+        Args:
+            exchange_rate_db_filename (str): Имя файла базы данных
+            daily (bool): Переводить зарплаты по ежедневным курсам
+        """
+        ExchangeRateConverter.shard_converter = ExchangeRateConverter(exchange_rate_db_filename, daily)
+        if daily:
+            ExchangeRateConverter.shard_converter.load_daily_exchange_rate()
+        else:
+            ExchangeRateConverter.shard_converter.load_exchange_rate()
+
+    @staticmethod
+    def convert_vacancies_shard(vacancies_filename: str, block_size: int, shard: tuple):
+        """Переводит в рубли вакансии из диапазона байт файла в процессе-обработчике.
+
+        Args:
+            vacancies_filename (str): Имя файла с вакансиями
+            block_size (int): Количество строк, переводимых в рубли за один вызов
+            shard (tuple): Начало и конец диапазона в байтах
+
+        Returns:
+            list: Строки для записи в базу данных
+        """
+        start, stop = shard
+        with open(vacancies_filename, 'rb') as vacancies:
+            vacancies.seek(start)
+            shard = vacancies.read(stop - start).decode('utf-8')
+        reader = csv.reader(io.StringIO(shard, newline=''))
+        return list(ExchangeRateConverter.shard_converter.convert_vacancies_lines(reader, block_size))
+
+    def process_vacancies_file(self, vacancies_filename: str, result_filename: str, block_size: int = 100000,
+                               process_count: int = 1, mode: str = 'replace'):
         """Обрабатывает файл с вакансиями и сохраняет его в базу данных.
 
+        Зарплаты переводятся в рубли блоками по block_size строк. Если process_count больше 1,
+        файл разбивается на части по границам строк, которые обрабатываются в пуле процессов,
+        а результаты записываются в базу данных в исходном порядке строк.
+
         Args:
             vacancies_filename (str): Имя файла с вакансиями
             result_filename (str): Имя обработанного результата
+            block_size (int): Количество строк, переводимых в рубли за один вызов
+            process_count (int): Количество процессов-обработчиков
+            mode (str): Режим загрузки в базу данных, см. VacanciesLoader.load
+        """
+        loader = VacanciesLoader(result_filename)
+        if process_count > 1:
+            shards = ExchangeRateConverter.split_vacancies_file(vacancies_filename, process_count * 4)
+            with multiprocessing.Pool(process_count, initializer=ExchangeRateConverter.init_shard_converter,
+                                      initargs=(self.exchange_rate_db_filename, self.daily)) as pool:
+                convert_shard = functools.partial(ExchangeRateConverter.convert_vacancies_shard,
+                                                  vacancies_filename, block_size)
+                loader.load(itertools.chain.from_iterable(pool.imap(convert_shard, shards)), mode)
+        else:
+            with open(vacancies_filename, 'r', encoding="utf-8-sig") as vacancies:
+                reader = csv.reader(vacancies)
+                next(reader)
+                loader.load(self.convert_vacancies_lines(reader, block_size), mode)
+
+
+class VacanciesLoader:
+    """Класс, используемый для загрузки вакансий в базу данных.
+
+    Attributes:
+        db_filename (str): Имя файла базы данных
+        batch_size (int): Количество строк, записываемых в одной транзакции
+    """
+
+    bulk_load_pragmas = {'journal_mode': 'MEMORY', 'synchronous': 'OFF', 'cache_size': -262144}
+
+    def __init__(self, db_filename: str, batch_size: int = 50000):
+        """Инициализирует экземпляр VacanciesLoader.
+
+        Args:
+            db_filename (str): Имя файла базы данных
+            batch_size (int): Количество строк, записываемых в одной транзакции
+        """
+        self.db_filename = db_filename
+        self.batch_size = batch_size
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection, mode: str):
+        """Создает таблицу вакансий. В режиме replace существующая таблица, куб и индекс названий удаляются.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+            mode (str): Режим загрузки
         """
-        vacancies = open(vacancies_filename, 'r', encoding="utf-8-sig")
-        reader = csv.reader(vacancies)
-        next(reader)
-        data = []
-        for line in reader:
-            name = line[0]
-            salary_from = line[1]
-            salary_to = line[2]
-            salary_currency = line[3]
-            published_at = datetime.datetime.strptime(line[5], '%Y-%m-%dT%H:%M:%S%z')
-            if salary_from == salary_to == '' or salary_currency == '':
-                salary = None
-            elif (salary_from == '' and salary_to != '') or (salary_from != '' and salary_to == ''):
-                if salary_from != "":
-                    salary = self.convert_to_rubles_per_month_year(float(salary_from), salary_currency,
-                                                                   published_at.year, published_at.month)
-                else:
-                    salary = self.convert_to_rubles_per_month_year(float(salary_to), salary_currency,
-                                                                   published_at.year, published_at.month)
-            else:
-                salary = self.convert_to_rubles_per_month_year((float(salary_from) + float(salary_to)) / 2,
-                                                               salary_currency, published_at.year, published_at.month)
-            area = line[4]
-            data.append([name, salary, area, published_at.strftime("%Y-%m-%dT%H:%M:%S%z")])
-        conn = sqlite3.connect(result_filename)
-        cur = conn.cursor()
-        cur.execute("CREATE TABLE vacancies (name, salary, area_name, published_at)")
-        cur.executemany("INSERT INTO vacancies VALUES(?, ?, ?, ?)", data)
-        conn.commit()
-        conn.close()
-
-
-exchange_rate_converter = ExchangeRateConverter('currencies.sqlite')
-exchange_rate_converter.process_vacancies_file('vacancies_dif_currencies.csv', 'vacancies.sqlite')
+        if mode == 'replace':
+            conn.execute("DROP TABLE IF EXISTS vacancies_name_index")
+            conn.execute("DROP TABLE IF EXISTS vacancy_names")
+            conn.execute("DROP TABLE IF EXISTS vacancies_cube")
+            conn.execute("DROP TABLE IF EXISTS vacancies")
+        conn.execute("CREATE TABLE IF NOT EXISTS vacancies (id INTEGER PRIMARY KEY, name TEXT, salary INTEGER, "
+                     "area_name TEXT, published_at TEXT, year INTEGER, year_month TEXT)")
+
+    @staticmethod
+    def create_indexes(conn: sqlite3.Connection):
+        """Создает индекс таблицы вакансий по названию, региону и дате публикации.
+
+        По этому индексу в режиме append заменяются ранее сохраненные вакансии. Индексы по году, региону
+        и названию, созданные прежними версиями загрузчика, удаляются: статистика считается по кубу вакансий.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+        """
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_vacancies_identity ON vacancies (name, area_name, published_at)")
+        for index in ('ix_vacancies_year', 'ix_vacancies_area_name', 'ix_vacancies_name'):
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    @staticmethod
+    def create_cube(conn: sqlite3.Connection):
+        """Создает и заполняет куб вакансий, если его еще нет.
+
+        Куб хранит сумму и количество зарплат, количество названий и регионов для каждой комбинации
+        названия вакансии, региона и года, поэтому статистика считается по кубу, а не по всем вакансиям.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+        """
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'vacancies_cube'").fetchone():
+            return
+        conn.execute("CREATE TABLE vacancies_cube (name TEXT, area_name TEXT, year INTEGER, salary_sum, "
+                     "salary_count INTEGER, name_count INTEGER, area_count INTEGER)")
+        conn.execute("INSERT INTO vacancies_cube SELECT name, area_name, year, sum(salary), count(salary), "
+                     "count(name), count(area_name) FROM vacancies GROUP BY name, area_name, year")
+        conn.execute("CREATE INDEX ix_vacancies_cube ON vacancies_cube (name, area_name, year)")
+
+    @staticmethod
+    def update_cube(conn: sqlite3.Connection, keys: list):
+        """Пересчитывает строки куба для комбинаций названия, региона и года, вакансии которых изменились.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+            keys (list): Комбинации (название, регион, год)
+        """
+        conn.executemany("DELETE FROM vacancies_cube WHERE name IS ? AND area_name IS ? AND year IS ?", keys)
+        conn.executemany("INSERT INTO vacancies_cube SELECT name, area_name, year, sum(salary), count(salary), "
+                         "count(name), count(area_name) FROM vacancies "
+                         "WHERE name IS ? AND area_name IS ? AND year IS ? GROUP BY name, area_name, year", keys)
+
+    @staticmethod
+    def create_name_index(conn: sqlite3.Connection):
+        """Создает и заполняет полнотекстовый индекс различных названий вакансий из куба, если его еще нет.
+
+        Названия хранятся в таблице vacancy_names, а индекс vacancies_name_index с токенизатором trigram
+        ссылается на нее, поэтому поиск профессии по LIKE выполняется по индексу, а не по всем названиям куба.
+        Индекс по таблице вакансий, созданный прежними версиями загрузчика, удаляется.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+        """
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'vacancy_names'").fetchone():
+            return
+        conn.execute("DROP TABLE IF EXISTS vacancies_name_index")
+        conn.execute("CREATE TABLE vacancy_names (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+        conn.execute("INSERT INTO vacancy_names (name) SELECT DISTINCT name FROM vacancies_cube WHERE name IS NOT NULL")
+        conn.execute("CREATE VIRTUAL TABLE vacancies_name_index USING fts5(name, content='vacancy_names', "
+                     "content_rowid='id', tokenize='trigram')")
+        conn.execute("INSERT INTO vacancies_name_index (vacancies_name_index) VALUES('rebuild')")
+
+    @staticmethod
+    def update_name_index(conn: sqlite3.Connection, names: set):
+        """Добавляет в полнотекстовый индекс названия вакансий, которых в нем еще нет.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+            names (set): Названия вакансий
+        """
+        last_id = conn.execute("SELECT ifnull(max(id), 0) FROM vacancy_names").fetchone()[0]
+        conn.executemany("INSERT OR IGNORE INTO vacancy_names (name) VALUES (?)", [(name,) for name in names])
+        conn.execute("INSERT INTO vacancies_name_index (rowid, name) SELECT id, name FROM vacancy_names WHERE id > ?",
+                     (last_id,))
+
+    def load(self, rows, mode: str = 'replace'):
+        """Записывает вакансии в базу данных транзакциями по batch_size строк.
+
+        На время загрузки включаются прагмы bulk_load_pragmas, после загрузки восстанавливаются прежние значения.
+        В режиме replace таблица создается заново. В режиме append вакансии добавляются к существующим,
+        а ранее сохраненные вакансии с тем же названием, регионом и датой публикации заменяются новыми.
+        Куб вакансий и полнотекстовый индекс названий в режиме replace строятся после загрузки,
+        а в режиме append обновляются вместе с каждой транзакцией.
+
+        Args:
+            rows: Строки для записи в базу данных
+            mode (str): Режим загрузки, replace или append
+        """
+        if mode not in ('replace', 'append'):
+            raise ValueError(f'Неизвестный режим загрузки: {mode}')
+        conn = sqlite3.connect(self.db_filename)
+        previous_pragmas = {pragma: conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+                            for pragma in VacanciesLoader.bulk_load_pragmas}
+        try:
+            for pragma, value in VacanciesLoader.bulk_load_pragmas.items():
+                conn.execute(f"PRAGMA {pragma} = {value}")
+            VacanciesLoader.create_table(conn, mode)
+            if mode == 'append':
+                VacanciesLoader.create_indexes(conn)
+                VacanciesLoader.create_cube(conn)
+                VacanciesLoader.create_name_index(conn)
+            conn.commit()
+            rows = iter(rows)
+            while True:
+                batch = list(itertools.islice(rows, self.batch_size))
+                if not batch:
+                    break
+                if mode == 'append':
+                    identities = [(row[0], row[2], row[3]) for row in batch]
+                    conn.executemany("DELETE FROM vacancies WHERE name = ? AND area_name = ? AND published_at = ?",
+                                     identities)
+                conn.executemany("INSERT INTO vacancies (name, salary, area_name, published_at, year, year_month) "
+                                 "VALUES(?, ?, ?, ?, ?, ?)", batch)
+                if mode == 'append':
+                    VacanciesLoader.update_cube(conn, list({(row[0], row[2], row[4]) for row in batch}))
+                    VacanciesLoader.update_name_index(conn, {row[0] for row in batch if row[0] is not None})
+                conn.commit()
+            VacanciesLoader.create_indexes(conn)
+            VacanciesLoader.create_cube(conn)
+            VacanciesLoader.create_name_index(conn)
+            conn.commit()
+        finally:
+            conn.rollback()
+            for pragma, value in previous_pragmas.items():
+                conn.execute(f"PRAGMA {pragma} = {value}")
+            conn.close()
+
+
+if __name__ == '__main__':
+    exchange_rate_converter = ExchangeRateConverter('currencies.sqlite')
+    exchange_rate_converter.process_vacancies_file('vacancies_dif_currencies.csv', 'vacancies.sqlite')
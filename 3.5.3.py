@@ -1,4 +1,7 @@
+import argparse
+import copy
 import sqlite3
+import sys
 import pandas as pd
 
 
@@ -17,51 +20,181 @@ class DataSet:
     def process_statistics(self, db_filename: str, profession: str):
         """Рассчитывает статистику по выбранной профессии.
 
+        Статистика рассчитывается по кубу вакансий vacancies_cube, поэтому время расчета
+        зависит от количества комбинаций названия, региона и года, а не от количества вакансий.
+        Названия вакансий, подходящие под профессию, находятся по полнотекстовому индексу vacancies_name_index.
+
         Args:
             db_filename (str): Имя файла базы данных с вакансиями
             profession (str): Выбранная профессия
         """
         conn = sqlite3.connect(db_filename)
+        DataSet.create_cube_if_missing(conn)
+        DataSet.create_name_index_if_missing(conn)
+        self.__process_common_statistics(conn)
+        statistics = pd.read_sql_query(
+            """
+        SELECT CAST(year AS TEXT) AS year,
+        round(CAST(sum(salary_sum) AS REAL) / sum(salary_count)) AS profession_salary,
+        sum(name_count) AS profession_count
+        FROM vacancies_cube
+        WHERE name IN (SELECT name FROM vacancies_name_index WHERE name LIKE ?)
+        GROUP BY year;
+        """, conn, params=(f'%{profession}%',))
+        conn.close()
+        self.profession_salaries = statistics[['year', 'profession_salary']]
+        self.profession_count = statistics[['year', 'profession_count']]
+
+    def process_batch_statistics(self, db_filename: str, professions: list):
+        """Рассчитывает статистику сразу для нескольких профессий.
+
+        Общая статистика рассчитывается один раз. Профессии записываются во временную таблицу
+        с номером профессии, и статистика всех профессий по годам считается по кубу вакансий
+        одним запросом с группировкой по номеру профессии и году. Шаблоны профессий
+        проверяются по полнотекстовому индексу уникальных названий вакансий vacancies_name_index.
+
+        Args:
+            db_filename (str): Имя файла базы данных с вакансиями
+            professions (list): Профессии
+
+        Returns:
+            list: Экземпляры DataSet со статистикой для каждой профессии в порядке professions
+        """
+        conn = sqlite3.connect(db_filename)
+        DataSet.create_cube_if_missing(conn)
+        DataSet.create_name_index_if_missing(conn)
+        self.__process_common_statistics(conn)
+        conn.execute("DROP TABLE IF EXISTS temp.professions")
+        conn.execute("CREATE TEMP TABLE professions (id INTEGER PRIMARY KEY, pattern TEXT)")
+        conn.executemany("INSERT INTO professions (id, pattern) VALUES (?, ?)",
+                         [(profession_id, f'%{profession}%') for profession_id, profession in enumerate(professions)])
+        statistics = pd.read_sql_query(
+            """
+        SELECT professions.id AS profession_id, CAST(vacancies_cube.year AS TEXT) AS year,
+        round(CAST(sum(vacancies_cube.salary_sum) AS REAL) / sum(vacancies_cube.salary_count)) AS profession_salary,
+        sum(vacancies_cube.name_count) AS profession_count
+        FROM professions
+        JOIN vacancies_name_index AS names ON names.name LIKE professions.pattern
+        JOIN vacancies_cube ON vacancies_cube.name = names.name
+        GROUP BY professions.id, vacancies_cube.year;
+        """, conn)
+        conn.close()
+        profession_statistics = dict(tuple(statistics.groupby('profession_id')))
+        results = []
+        for profession_id in range(len(professions)):
+            rows = profession_statistics.get(profession_id, pd.DataFrame(columns=statistics.columns))
+            dataset = copy.copy(self)
+            dataset.profession_salaries = rows[['year', 'profession_salary']].reset_index(drop=True)
+            dataset.profession_count = rows[['year', 'profession_count']].reset_index(drop=True)
+            results.append(dataset)
+        return results
+
+    @staticmethod
+    def create_cube_if_missing(conn: sqlite3.Connection):
+        """Создает временный куб вакансий, если база данных загружена без куба.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+        """
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'vacancies_cube'").fetchone():
+            return
+        DataSet.add_year_columns_if_missing(conn)
+        conn.execute("DROP TABLE IF EXISTS temp.vacancies_cube")
+        conn.execute(
+            """
+        CREATE TEMP TABLE vacancies_cube AS
+        SELECT name, area_name, year, sum(salary) AS salary_sum, count(salary) AS salary_count,
+        count(name) AS name_count, count(area_name) AS area_count
+        FROM vacancies GROUP BY name, area_name, year;
+        """)
+        conn.execute("CREATE INDEX temp.ix_vacancies_cube ON vacancies_cube (name, area_name, year)")
+
+    @staticmethod
+    def add_year_columns_if_missing(conn: sqlite3.Connection):
+        """Добавляет в таблицу вакансий столбцы year и year_month, если база данных загружена без них.
+
+        Прежние версии 3.5.2.py не сохраняли эти столбцы. Они заполняются по началу даты публикации published_at.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+        """
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(vacancies)")]
+        if 'year' in columns and 'year_month' in columns:
+            return
+        with conn:
+            if 'year' not in columns:
+                conn.execute("ALTER TABLE vacancies ADD COLUMN year INTEGER")
+                conn.execute("UPDATE vacancies SET year = CAST(substr(published_at, 1, 4) AS INTEGER)")
+            if 'year_month' not in columns:
+                conn.execute("ALTER TABLE vacancies ADD COLUMN year_month TEXT")
+                conn.execute("UPDATE vacancies SET year_month = substr(published_at, 1, 7)")
+
+    @staticmethod
+    def create_name_index_if_missing(conn: sqlite3.Connection):
+        """Создает временный полнотекстовый индекс названий вакансий, если база данных загружена без него.
+
+        Индекс прежних версий загрузчика содержит названия всех вакансий, а не уникальные названия куба,
+        поэтому вместо него тоже создается временный индекс.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+        """
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'vacancy_names'").fetchone():
+            return
+        conn.execute("DROP TABLE IF EXISTS temp.vacancies_name_index")
+        conn.execute("CREATE VIRTUAL TABLE temp.vacancies_name_index USING fts5(name, tokenize='trigram')")
+        conn.execute("INSERT INTO temp.vacancies_name_index (name) "
+                     "SELECT DISTINCT name FROM vacancies_cube WHERE name IS NOT NULL")
+
+    def __process_common_statistics(self, conn: sqlite3.Connection):
+        """Рассчитывает статистику по годам и по городам.
+
+        Куб вакансий предварительно группируется по году и региону во временную таблицу statistics.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+        """
+        conn.execute("DROP TABLE IF EXISTS temp.statistics")
+        conn.execute(
+            """
+        CREATE TEMP TABLE statistics AS
+        SELECT year, area_name,
+        sum(salary_sum) AS salary_sum, sum(salary_count) AS salary_count,
+        sum(name_count) AS name_count, sum(area_count) AS area_count
+        FROM vacancies_cube GROUP BY year, area_name;
+        """)
+        area_count = conn.execute("SELECT sum(area_count) FROM statistics").fetchone()[0]
         self.vacancies_year_salaries = pd.DataFrame(pd.read_sql_query(
             """
-        SELECT strftime('%Y', substr(published_at, 1, 10)) AS year,
-		round(avg(salary)) AS salary FROM vacancies GROUP BY year;
+        SELECT CAST(year AS TEXT) AS year,
+        round(CAST(sum(salary_sum) AS REAL) / sum(salary_count)) AS salary
+        FROM statistics GROUP BY statistics.year;
         """
         , conn))
         self.vacancies_year_count = pd.DataFrame(pd.read_sql_query(
             """
-        SELECT strftime('%Y', substr(published_at, 1, 10)) AS year,
-		count(name) as count FROM vacancies GROUP BY year;
+        SELECT CAST(year AS TEXT) AS year,
+        sum(name_count) AS count FROM statistics GROUP BY statistics.year;
         """
         , conn))
-        self.profession_salaries = pd.DataFrame(pd.read_sql_query(
-            f"""
-        SELECT strftime('%Y', substr(published_at, 1, 10)) AS year,
- 		round(avg(salary)) AS profession_salary FROM vacancies WHERE name like '%{profession}%' GROUP BY year;
-        """, conn))
-        self.profession_count = pd.DataFrame(pd.read_sql_query(
-            f"""
-        SELECT strftime('%Y', substr(published_at, 1, 10)) AS year,
-        count(name) as profession_count FROM vacancies WHERE name like '%{profession}%' GROUP BY year;
-        """, conn))
         self.vacancies_area_salaries = pd.DataFrame(pd.read_sql_query(
             """
-        SELECT area_name, round(avg(salary)) AS salary 
-        FROM vacancies 
-        GROUP BY area_name 
-        HAVING CAST(count(area_name) as REAL) * 100 / (SELECT count(area_name) FROM vacancies) >= 1
+        SELECT area_name, round(CAST(sum(salary_sum) AS REAL) / sum(salary_count)) AS salary
+        FROM statistics
+        GROUP BY area_name
+        HAVING CAST(sum(area_count) as REAL) * 100 / :area_count >= 1
         ORDER BY salary DESC
         LIMIT 10;
-        """, conn))
+        """, conn, params={'area_count': area_count}))
         self.fractions = pd.DataFrame(pd.read_sql_query(
             """
-        SELECT area_name, CAST(count(area_name) as REAL) * 100 / (SELECT count(area_name) FROM vacancies) AS percentage
-        FROM vacancies 
-        GROUP BY area_name 
+        SELECT area_name, CAST(sum(area_count) as REAL) * 100 / :area_count AS percentage
+        FROM statistics
+        GROUP BY area_name
         HAVING percentage >= 1
         ORDER BY percentage DESC
         LIMIT 10;
-        """, conn))
+        """, conn, params={'area_count': area_count}))
 
 
 class InputConnect:
@@ -84,8 +217,34 @@ class InputConnect:
         print(f'Уровень зарплат по городам:\n{dataset.vacancies_area_salaries.to_string()}')
         print(f'Доля вакансий по городам:\n{dataset.fractions.to_string()}')
 
-    def __init__(self):
-        """Инициализирует экземпляр InputConnect."""
+    @staticmethod
+    def create_parser():
+        """Создает разбор параметров командной строки.
+
+        Returns:
+            argparse.ArgumentParser: Разбор параметров командной строки
+        """
+        parser = argparse.ArgumentParser(description='Статистика по вакансиям из базы данных для нескольких профессий. '
+                                                     'Без параметров имя файла и профессия запрашиваются при запуске.')
+        parser.add_argument('db_filename', nargs='?', help='имя файла базы данных с вакансиями')
+        parser.add_argument('--professions', nargs='+', metavar='PROFESSION',
+                            help='профессии, по умолчанию читаются из стандартного ввода по одной в строке')
+        return parser
+
+    def __init__(self, db_filename: str = None, professions: list = None):
+        """Инициализирует экземпляр InputConnect.
+
+        Если переданы db_filename и professions, статистика выводится для всех профессий без ввода данных,
+        иначе имя файла и профессия запрашиваются у пользователя.
+
+        Args:
+            db_filename (str): Имя файла базы данных с вакансиями
+            professions (list): Профессии для пакетного расчета статистики
+        """
+        if professions is not None:
+            self.db_filename = db_filename
+            self.display_batch_statistics(professions)
+            return
         self.db_filename = input('Введите название файла: ')
         self.profession = input('Введите название профессии: ')
         if self.db_filename and self.profession:
@@ -93,5 +252,21 @@ class InputConnect:
             dataset.process_statistics(self.db_filename, self.profession)
             self.display_statistics(dataset)
 
+    def display_batch_statistics(self, professions: list):
+        """Рассчитывает и выводит статистику для нескольких профессий за один проход по базе данных.
+
+        Args:
+            professions (list): Профессии
+        """
+        datasets = DataSet().process_batch_statistics(self.db_filename, professions)
+        for profession, dataset in zip(professions, datasets):
+            print(f'Профессия: {profession}')
+            self.display_statistics(dataset)
+
 
-InputConnect()
+if __name__ == '__main__':
+    args = InputConnect.create_parser().parse_args()
+    if args.db_filename is None:
+        InputConnect()
+    else:
+        InputConnect(args.db_filename, args.professions or [line.strip() for line in sys.stdin if line.strip()])
@@ -0,0 +1,408 @@
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from exchange_rate_store import ExchangeRateStore
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class VacanciesGenerator:
+    """Класс, используемый для создания синтетических вакансий и курсов валют.
+
+    Вакансии имеют те же столбцы, что и vacancies_dif_currencies.csv: name, salary_from, salary_to,
+    salary_currency, area_name и published_at. Названия вакансий и регионы выбираются с убывающими
+    вероятностями, как в реальных данных. При одинаковом seed создаются одинаковые файлы.
+
+    Attributes:
+        seed (int): Начальное значение генератора случайных чисел
+    """
+
+    levels = ['', 'Junior ', 'Middle ', 'Senior ', 'Ведущий ', 'Старший ']
+    professions = ['Программист', 'Программист 1С', 'Инженер-программист', 'Python developer', 'Java developer',
+                   'Frontend-разработчик', 'Аналитик', 'Системный аналитик', 'Data Scientist', 'Тестировщик',
+                   'DevOps инженер', 'Системный администратор', 'Менеджер проектов', 'Менеджер по продажам',
+                   'Дизайнер', 'Бухгалтер', 'Специалист технической поддержки', 'Оператор call-центра']
+    specializations = ['', ' backend', ' (удаленно)', ' в команду разработки', ' (стажер)']
+    cities = ['Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Нижний Новгород', 'Краснодар',
+              'Самара', 'Ростов-на-Дону', 'Воронеж', 'Минск', 'Алматы', 'Киев', 'Ташкент', 'Баку']
+    town_count = 300
+    currency_weights = {'RUR': 0.88, 'USD': 0.04, 'EUR': 0.02, 'KZT': 0.02, 'BYR': 0.01, 'UAH': 0.01,
+                        'AZN': 0.005, 'KGS': 0.005, 'UZS': 0.005, 'GEL': 0.005}
+    exchange_rates = {'BYR': 0.0164, 'USD': 31.78, 'EUR': 33.27, 'KZT': 0.204, 'UAH': 5.94,
+                      'AZN': 36.2, 'KGS': 0.76, 'UZS': 0.0083}
+    first_rate_years = {'AZN': 2006, 'KGS': 2008, 'UZS': 2010}
+    first_year = 2003
+    last_year = 2022
+    columns = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+
+    def __init__(self, seed: int = 0):
+        """Инициализирует экземпляр VacanciesGenerator.
+
+        Args:
+            seed (int): Начальное значение генератора случайных чисел
+        """
+        self.seed = seed
+
+    @staticmethod
+    def get_weights(count: int):
+        """Возвращает вероятности, убывающие обратно пропорционально номеру значения.
+
+        Args:
+            count (int): Количество значений
+
+        Returns:
+            np.ndarray: Вероятности значений
+        """
+        weights = 1 / np.arange(1, count + 1)
+        return weights / weights.sum()
+
+    @staticmethod
+    def get_months():
+        """Возвращает месяцы, для которых создаются курсы валют.
+
+        Returns:
+            list: Месяцы в формате YYYY-MM
+        """
+        return [f'{year}-{month:02}' for year in range(VacanciesGenerator.first_year, VacanciesGenerator.last_year + 1)
+                for month in range(1, 13)]
+
+    def create_vacancies(self, rng: np.random.Generator, count: int):
+        """Создает часть синтетических вакансий.
+
+        Args:
+            rng (np.random.Generator): Генератор случайных чисел
+            count (int): Количество вакансий
+
+        Returns:
+            pd.DataFrame: Вакансии со столбцами columns
+        """
+        names = np.array([f'{level}{profession}{specialization}' for profession in VacanciesGenerator.professions
+                          for specialization in VacanciesGenerator.specializations
+                          for level in VacanciesGenerator.levels], dtype=object)
+        areas = np.array(VacanciesGenerator.cities + [f'Город {number}'
+                                                      for number in range(1, VacanciesGenerator.town_count + 1)],
+                         dtype=object)
+        currencies = np.array(list(VacanciesGenerator.currency_weights), dtype=object)
+        salary_kind = rng.random(count)
+        salary_from = rng.integers(10, 150, count) * 1000.0
+        salary_to = salary_from + rng.integers(0, 100, count) * 1000.0
+        salary_from[(salary_kind < 0.35) | ((salary_kind >= 0.6) & (salary_kind < 0.7))] = np.nan
+        salary_to[salary_kind < 0.6] = np.nan
+        salary_currency = currencies[rng.choice(len(currencies), count,
+                                                p=list(VacanciesGenerator.currency_weights.values()))]
+        salary_currency[salary_kind < 0.35] = np.nan
+        first_second = np.datetime64(f'{VacanciesGenerator.first_year}-01-01T00:00:00', 's')
+        last_second = np.datetime64(f'{VacanciesGenerator.last_year + 1}-01-01T00:00:00', 's')
+        seconds = rng.integers(0, (last_second - first_second).astype('int64'), count)
+        published_at = pd.Series(np.datetime_as_string(first_second + seconds, unit='s')) + '+0300'
+        return pd.DataFrame({'name': names[rng.choice(len(names), count, p=VacanciesGenerator.get_weights(len(names)))],
+                             'salary_from': salary_from, 'salary_to': salary_to, 'salary_currency': salary_currency,
+                             'area_name': areas[rng.choice(len(areas), count,
+                                                           p=VacanciesGenerator.get_weights(len(areas)))],
+                             'published_at': published_at}, columns=VacanciesGenerator.columns)
+
+    def generate_vacancies(self, filename: str, row_count: int, chunk_size: int = 1000000):
+        """Создает csv файл с синтетическими вакансиями.
+
+        Файл записывается частями по chunk_size строк, поэтому потребление памяти не зависит от row_count.
+
+        Args:
+            filename (str): Имя csv файла с вакансиями
+            row_count (int): Количество вакансий
+            chunk_size (int): Количество вакансий в одной части
+        """
+        rng = np.random.default_rng(self.seed)
+        with open(filename, 'w', encoding='utf-8-sig', newline='') as vacancies_file:
+            pd.DataFrame(columns=VacanciesGenerator.columns).to_csv(vacancies_file, index=False)
+            for start in range(0, row_count, chunk_size):
+                self.create_vacancies(rng, min(chunk_size, row_count - start)) \
+                    .to_csv(vacancies_file, index=False, header=False)
+
+    def generate_exchange_rates(self, csv_filename: str, db_filename: str):
+        """Создает курсы валют по месяцам в csv файле для 3.4.1.py и в базе данных для 3.5.2.py.
+
+        Курсы меняются случайным блужданием. Курсов некоторых валют нет за первые годы, курсов GEL нет совсем.
+
+        Args:
+            csv_filename (str): Имя csv файла с курсами, по столбцу на валюту
+            db_filename (str): Имя файла базы данных с курсами в длинном формате
+        """
+        rng = np.random.default_rng(self.seed)
+        months = VacanciesGenerator.get_months()
+        data = pd.DataFrame(index=pd.Index(months, name='date'))
+        for currency, rate in VacanciesGenerator.exchange_rates.items():
+            rates = rate * np.exp(np.cumsum(rng.normal(0, 0.02, len(months))))
+            first_year = VacanciesGenerator.first_rate_years.get(currency, VacanciesGenerator.first_year)
+            rates[:(first_year - VacanciesGenerator.first_year) * 12] = np.nan
+            data[currency] = rates.round(6)
+        data.to_csv(csv_filename)
+        if os.path.exists(db_filename):
+            os.remove(db_filename)
+        ExchangeRateStore(db_filename).write(data, replace=True)
+
+
+class Benchmark:
+    """Класс, используемый для измерения производительности обработки вакансий и расчета статистики.
+
+    Для каждого размера данных измеряются этапы stages. Каждый этап запускается в отдельном процессе
+    интерпретатора, поэтому время импорта модулей и пиковое потребление памяти относятся только к этому этапу.
+    Статистика 3.4.2.py и 3.4.3.py считается дважды: с построением куба вакансий и по сохраненному кубу.
+
+    Attributes:
+        directory (str): Папка с синтетическими данными
+        profession (str): Профессия для расчета статистики
+        area (str): Регион для расчета статистики 3.4.3.py
+        chunk_size (int): Количество строк в одной части при обработке вакансий 3.4.1.py
+        process_count (int): Количество процессов при обработке вакансий 3.5.2.py
+        seed (int): Начальное значение генератора синтетических данных
+    """
+
+    stages = ['parse_vacancies', 'statistics_3.4.2', 'statistics_3.4.3', 'process_vacancies_file', 'statistics_3.5.3']
+
+    def __init__(self, directory: str, profession: str, area: str, chunk_size: int = 1000000,
+                 process_count: int = 1, seed: int = 0):
+        """Инициализирует экземпляр Benchmark.
+
+        Args:
+            directory (str): Папка с синтетическими данными
+            profession (str): Профессия для расчета статистики
+            area (str): Регион для расчета статистики 3.4.3.py
+            chunk_size (int): Количество строк в одной части при обработке вакансий 3.4.1.py
+            process_count (int): Количество процессов при обработке вакансий 3.5.2.py
+            seed (int): Начальное значение генератора синтетических данных
+        """
+        self.directory = directory
+        self.profession = profession
+        self.area = area
+        self.chunk_size = chunk_size
+        self.process_count = process_count
+        self.seed = seed
+
+    @staticmethod
+    def load_module(filename: str, name: str):
+        """Загружает скрипт репозитория как модуль.
+
+        Имена скриптов начинаются с цифр, поэтому их нельзя импортировать оператором import.
+        Модуль регистрируется в sys.modules, чтобы его функции можно было передавать в пул процессов.
+
+        Args:
+            filename (str): Имя файла скрипта
+            name (str): Имя модуля
+
+        Returns:
+            module: Загруженный модуль
+        """
+        spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                         filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        return module
+
+    @staticmethod
+    def get_peak_rss():
+        """Возвращает пиковое потребление памяти процессом и завершенными дочерними процессами.
+
+        Returns:
+            float: Пиковый размер резидентной памяти в мегабайтах, None - если модуль resource недоступен
+        """
+        if resource is None:
+            return None
+        peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        return peak_rss / 1024 / 1024 if sys.platform == 'darwin' else peak_rss / 1024
+
+    def get_filenames(self, size: int):
+        """Возвращает имена файлов с данными для указанного количества вакансий.
+
+        Args:
+            size (int): Количество вакансий
+
+        Returns:
+            dict: Имена файлов
+        """
+        return {'vacancies': os.path.join(self.directory, f'vacancies_{size}.csv'),
+                'parsed': os.path.join(self.directory, f'parsed_{size}.csv'),
+                'database': os.path.join(self.directory, f'vacancies_{size}.sqlite'),
+                'currencies_csv': os.path.join(self.directory, 'currencies.csv'),
+                'currencies_db': os.path.join(self.directory, 'currencies.sqlite')}
+
+    def prepare(self, size: int):
+        """Создает синтетические курсы валют и вакансии, если их еще нет.
+
+        Args:
+            size (int): Количество вакансий
+
+        Returns:
+            float: Время создания вакансий в секундах, 0 - если файл уже был создан
+        """
+        filenames = self.get_filenames(size)
+        os.makedirs(self.directory, exist_ok=True)
+        generator = VacanciesGenerator(self.seed)
+        if not os.path.exists(filenames['currencies_db']):
+            generator.generate_exchange_rates(filenames['currencies_csv'], filenames['currencies_db'])
+        if os.path.exists(filenames['vacancies']):
+            return 0
+        started_at = time.perf_counter()
+        generator.generate_vacancies(filenames['vacancies'], size)
+        return time.perf_counter() - started_at
+
+    def measure_stage(self, stage: str, size: int):
+        """Выполняет этап в текущем процессе и измеряет его.
+
+        Args:
+            stage (str): Этап из stages
+            size (int): Количество вакансий
+
+        Returns:
+            dict: Время этапа, скорость обработки вакансий, пиковое потребление памяти и время шагов этапа
+        """
+        filenames = self.get_filenames(size)
+        steps = {}
+        started_at = time.perf_counter()
+        if stage == 'parse_vacancies':
+            module = Benchmark.load_module('3.4.1.py', 'vacancies_parser')
+            steps['import'] = time.perf_counter() - started_at
+            step_started_at = time.perf_counter()
+            converter = module.ExchangeRateConverter(filenames['currencies_csv'])
+            steps['load_exchange_rate'] = time.perf_counter() - step_started_at
+            step_started_at = time.perf_counter()
+            converter.parse_vacancies(filenames['vacancies'], filenames['parsed'], self.chunk_size)
+            steps['parse_vacancies'] = time.perf_counter() - step_started_at
+        elif stage in ('statistics_3.4.2', 'statistics_3.4.3'):
+            version = stage.split('_')[1]
+            module = Benchmark.load_module(f'{version}.py', f'statistics_{version.replace(".", "_")}')
+            steps['import'] = time.perf_counter() - started_at
+            query = (self.profession, self.area) if version == '3.4.3' else (self.profession,)
+            cube_filename = module.VacanciesCube(filenames['parsed']).cube_filename
+            if os.path.exists(cube_filename):
+                os.remove(cube_filename)
+            for run in ('cold', 'warm'):
+                step_started_at = time.perf_counter()
+                dataset = module.DataSet(filenames['parsed'])
+                dataset.process_statistics(filenames['parsed'], *query)
+                steps[f'{run}_total'] = time.perf_counter() - step_started_at
+                steps.update({f'{run}_{step}': duration for step, duration in dataset.timings.items()})
+        elif stage == 'process_vacancies_file':
+            module = Benchmark.load_module('3.5.2.py', 'vacancies_loader')
+            steps['import'] = time.perf_counter() - started_at
+            if os.path.exists(filenames['database']):
+                os.remove(filenames['database'])
+            step_started_at = time.perf_counter()
+            module.ExchangeRateConverter(filenames['currencies_db']) \
+                .process_vacancies_file(filenames['vacancies'], filenames['database'],
+                                        process_count=self.process_count)
+            steps['process_vacancies_file'] = time.perf_counter() - step_started_at
+        elif stage == 'statistics_3.5.3':
+            module = Benchmark.load_module('3.5.3.py', 'statistics_3_5_3')
+            steps['import'] = time.perf_counter() - started_at
+            step_started_at = time.perf_counter()
+            module.DataSet().process_statistics(filenames['database'], self.profession)
+            steps['process_statistics'] = time.perf_counter() - step_started_at
+        else:
+            raise ValueError(f'Неизвестный этап: {stage}')
+        seconds = time.perf_counter() - started_at
+        return {'seconds': seconds, 'rows_per_second': size / seconds if seconds else None,
+                'peak_rss_mb': Benchmark.get_peak_rss(), 'steps': steps}
+
+    def run_stage(self, stage: str, size: int):
+        """Выполняет этап в отдельном процессе интерпретатора.
+
+        Args:
+            stage (str): Этап из stages
+            size (int): Количество вакансий
+
+        Returns:
+            dict: Результат measure_stage
+        """
+        command = [sys.executable, os.path.abspath(__file__), '--stage', stage, '--size', str(size),
+                   '--directory', self.directory, '--profession', self.profession, '--area', self.area,
+                   '--chunk-size', str(self.chunk_size), '--processes', str(self.process_count),
+                   '--seed', str(self.seed)]
+        completed = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+        return json.loads(completed.stdout.decode('utf-8').splitlines()[-1])
+
+    def run(self, sizes: list):
+        """Измеряет все этапы для каждого размера данных.
+
+        Args:
+            sizes (list): Количества вакансий
+
+        Returns:
+            dict: Параметры запуска и результаты этапов для каждого размера данных
+        """
+        results = []
+        for size in sizes:
+            generate_seconds = self.prepare(size)
+            stages = {}
+            for stage in Benchmark.stages:
+                stages[stage] = self.run_stage(stage, size)
+                print(f'{size} {stage}: {stages[stage]["seconds"]:.3f} с', file=sys.stderr)
+            results.append({'size': size, 'generate_seconds': generate_seconds, 'stages': stages})
+        return {'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                'options': {'profession': self.profession, 'area': self.area, 'chunk_size': self.chunk_size,
+                            'process_count': self.process_count, 'seed': self.seed},
+                'results': results}
+
+    @staticmethod
+    def compare(report: dict, baseline: dict):
+        """Выводит изменение времени этапов относительно сохраненного ранее отчета.
+
+        Args:
+            report (dict): Результат run
+            baseline (dict): Сохраненный ранее результат run
+        """
+        baseline_results = {result['size']: result['stages'] for result in baseline['results']}
+        for result in report['results']:
+            for stage, measurement in result['stages'].items():
+                baseline_measurement = baseline_results.get(result['size'], {}).get(stage)
+                if baseline_measurement is None:
+                    continue
+                change = (measurement['seconds'] / baseline_measurement['seconds'] - 1) * 100
+                print(f'{result["size"]} {stage}: {measurement["seconds"]:.3f} с '
+                      f'(было {baseline_measurement["seconds"]:.3f} с, {change:+.1f}%)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Измерение производительности обработки вакансий '
+                                                 'и расчета статистики на синтетических данных.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 1000000, 10000000],
+                        help='количества вакансий')
+    parser.add_argument('--directory', default='benchmark_data', help='папка с синтетическими данными')
+    parser.add_argument('--output', default='benchmark.json', help='имя json файла с результатами')
+    parser.add_argument('--baseline', help='json файл с результатами предыдущего запуска для сравнения')
+    parser.add_argument('--profession', default='Программист', help='профессия для расчета статистики')
+    parser.add_argument('--area', default='Москва', help='регион для расчета статистики 3.4.3.py')
+    parser.add_argument('--chunk-size', type=int, default=1000000,
+                        help='количество строк в одной части при обработке вакансий 3.4.1.py')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='количество процессов при обработке вакансий 3.5.2.py')
+    parser.add_argument('--seed', type=int, default=0, help='начальное значение генератора синтетических данных')
+    parser.add_argument('--stage', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    benchmark = Benchmark(args.directory, args.profession, args.area, args.chunk_size, args.processes, args.seed)
+    if args.stage is not None:
+        print(json.dumps(benchmark.measure_stage(args.stage, args.size)))
+    else:
+        report = benchmark.run(args.sizes)
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=2)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as baseline_file:
+                Benchmark.compare(report, json.load(baseline_file))
@@ -0,0 +1,159 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+
+class ExchangeRateStore:
+    """Класс, используемый для хранения курсов валют в базе данных в длинном формате.
+
+    Каждый курс хранится отдельной строкой (дата, валюта, курс), поэтому новая валюта
+    добавляется без изменения схемы. Отсутствующий курс - это отсутствующая строка.
+    Базы данных прежнего широкого формата переносятся в длинный формат при первом обращении,
+    см. migrate_legacy_table.
+
+    Attributes:
+        db_filename (str): Имя файла базы данных
+        table (str): Имя таблицы курсов
+    """
+
+    monthly_table = 'exchange_rates'
+    daily_table = 'exchange_rates_daily'
+    legacy_tables = {monthly_table: 'currencies', daily_table: 'currencies_daily'}
+
+    def __init__(self, db_filename: str, table: str = monthly_table):
+        """Инициализирует экземпляр ExchangeRateStore.
+
+        Args:
+            db_filename (str): Имя файла базы данных
+            table (str): Имя таблицы курсов: exchange_rates для курсов по месяцам (дата YYYY-MM)
+                или exchange_rates_daily для курсов по дням (дата YYYY-MM-DD)
+        """
+        self.db_filename = db_filename
+        self.table = table
+
+    def create_table(self, conn: sqlite3.Connection):
+        """Создает таблицу курсов, если ее еще нет.
+
+        Первичный ключ (date, currency) хранит строки таблицы упорядоченными по дате,
+        а индекс (currency, date, rate) покрывает выборку курсов одной валюты.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+        """
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (date TEXT NOT NULL, currency TEXT NOT NULL, "
+                     f"rate REAL NOT NULL, PRIMARY KEY (date, currency)) WITHOUT ROWID")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.table}_currency ON {self.table} (currency, date, rate)")
+
+    @staticmethod
+    def has_table(conn: sqlite3.Connection, table: str):
+        """Проверяет, есть ли таблица в базе данных.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных
+            table (str): Имя таблицы
+
+        Returns:
+            bool: True, если таблица есть, в другом случае False
+        """
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (table,)).fetchone() is not None
+
+    def migrate_legacy_table(self):
+        """Переносит курсы из таблицы прежнего широкого формата, если таблицы курсов еще нет.
+
+        Прежние версии 3.5.1.py хранили курсы по месяцам в таблице currencies, а по дням - в таблице
+        currencies_daily, со столбцом для каждой валюты. Прежняя таблица не удаляется.
+        """
+        legacy_table = ExchangeRateStore.legacy_tables.get(self.table)
+        conn = sqlite3.connect(self.db_filename)
+        try:
+            if legacy_table is None or ExchangeRateStore.has_table(conn, self.table) \
+                    or not ExchangeRateStore.has_table(conn, legacy_table):
+                return
+        finally:
+            conn.close()
+        self.import_wide_table(legacy_table)
+
+    def get_latest_date(self):
+        """Возвращает дату последнего сохраненного курса.
+
+        Returns:
+            str: Дата последнего курса, None - если курсов нет
+        """
+        self.migrate_legacy_table()
+        conn = sqlite3.connect(self.db_filename)
+        try:
+            if not ExchangeRateStore.has_table(conn, self.table):
+                return None
+            return conn.execute(f"SELECT max(date) FROM {self.table}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def write(self, data: pd.DataFrame, replace: bool = False, currencies: list = None):
+        """Сохраняет курсы валют в одной транзакции.
+
+        Курсы за даты из data заменяют сохраненные курсы за те же даты. Если указаны currencies,
+        заменяются и удаляются только курсы этих валют, курсы остальных валют сохраняются.
+
+        Args:
+            data (pd.DataFrame): Курсы валют, индекс - дата, столбцы - валюты
+            replace (bool): Удалить все сохраненные курсы перед записью
+            currencies (list): Валюты, курсы которых заменяются, None - все валюты
+        """
+        if not replace:
+            self.migrate_legacy_table()
+        if currencies is not None:
+            data = data.reindex(columns=currencies)
+        rates = data.stack().dropna()
+        rows = [(date, currency, float(rate)) for (date, currency), rate in rates.items()]
+        conn = sqlite3.connect(self.db_filename)
+        try:
+            with conn:
+                self.create_table(conn)
+                if currencies is None and replace:
+                    conn.execute(f"DELETE FROM {self.table}")
+                elif currencies is None:
+                    conn.executemany(f"DELETE FROM {self.table} WHERE date = ?", [(date,) for date in data.index])
+                elif replace:
+                    conn.executemany(f"DELETE FROM {self.table} WHERE currency = ?",
+                                     [(currency,) for currency in currencies])
+                else:
+                    conn.executemany(f"DELETE FROM {self.table} WHERE date = ? AND currency = ?",
+                                     [(date, currency) for date in data.index for currency in currencies])
+                conn.executemany(f"INSERT INTO {self.table} (date, currency, rate) VALUES (?, ?, ?)", rows)
+        finally:
+            conn.close()
+
+    def load_matrix(self):
+        """Загружает курсы валют и разворачивает их в плотную матрицу.
+
+        Returns:
+            tuple: Отсортированный массив дат, список валют и матрица курсов размера
+                (количество дат, количество валют), в которой отсутствующие курсы равны NaN
+        """
+        self.migrate_legacy_table()
+        conn = sqlite3.connect(self.db_filename)
+        try:
+            rows = conn.execute(f"SELECT date, currency, rate FROM {self.table}").fetchall()
+        finally:
+            conn.close()
+        dates, currencies, rates = (np.array(column) for column in zip(*rows)) if rows else ([], [], [])
+        dates, date_positions = np.unique(np.asarray(dates, dtype=str), return_inverse=True)
+        currencies, currency_positions = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        matrix = np.full((len(dates), len(currencies)), np.nan)
+        matrix[date_positions.reshape(-1), currency_positions.reshape(-1)] = np.asarray(rates, dtype='float64')
+        return dates, currencies.tolist(), matrix
+
+    def import_wide_table(self, source_table: str):
+        """Переносит курсы из таблицы с отдельным столбцом для каждой валюты.
+
+        Args:
+            source_table (str): Имя таблицы со столбцом date и столбцами валют
+        """
+        conn = sqlite3.connect(self.db_filename)
+        try:
+            data = pd.read_sql_query(f"SELECT * FROM {source_table}", conn, index_col='date')
+        finally:
+            conn.close()
+        self.write(data, replace=True)
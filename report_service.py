@@ -0,0 +1,110 @@
+import json
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class ReportService:
+    """Класс, используемый для обслуживания запросов отчетов по локальному HTTP API.
+
+    Сервис работает в одном долгоживущем процессе, поэтому данные вакансий, шаблоны отчетов
+    и пул процессов для рисования графиков загружаются один раз, а не для каждого отчета.
+    Запросы обрабатываются одновременно в отдельных потоках.
+
+    Запросы:
+        GET /statistics?profession=...: статистика в формате JSON
+        GET /report?profession=...: pdf отчет
+
+    Attributes:
+        reports: Объект с атрибутом required_params - списком обязательных параметров запроса
+            и методами get_statistics(params) и create_report(params), где params - параметры запроса
+        host (str): Адрес, на котором принимаются запросы
+        port (int): Порт, на котором принимаются запросы
+    """
+
+    def __init__(self, reports, host: str = '127.0.0.1', port: int = 8000):
+        """Инициализирует экземпляр ReportService.
+
+        Args:
+            reports: Объект с атрибутом required_params и методами get_statistics(params) и create_report(params)
+            host (str): Адрес, на котором принимаются запросы
+            port (int): Порт, на котором принимаются запросы
+        """
+        self.reports = reports
+        self.host = host
+        self.port = port
+
+    def create_server(self):
+        """Создает HTTP сервер, обрабатывающий каждый запрос в отдельном потоке.
+
+        Returns:
+            ThreadingHTTPServer: HTTP сервер
+        """
+        service = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                service.handle_request(self)
+
+        return ThreadingHTTPServer((self.host, self.port), RequestHandler)
+
+    def serve_forever(self):
+        """Принимает запросы до остановки процесса."""
+        with self.create_server() as server:
+            print(f'Сервис отчетов запущен: http://{self.host}:{server.server_address[1]}')
+            server.serve_forever()
+
+    def handle_request(self, request: BaseHTTPRequestHandler):
+        """Отвечает на запрос статистики или отчета.
+
+        Args:
+            request (BaseHTTPRequestHandler): Запрос
+        """
+        url = urlparse(request.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        if url.path not in ('/statistics', '/report'):
+            ReportService.send_error(request, HTTPStatus.NOT_FOUND, f'Неизвестный путь: {url.path}')
+            return
+        missing_params = [name for name in self.reports.required_params if name not in params]
+        if missing_params:
+            ReportService.send_error(request, HTTPStatus.BAD_REQUEST,
+                                     f'Не указан параметр: {", ".join(missing_params)}')
+            return
+        try:
+            if url.path == '/statistics':
+                content = json.dumps(self.reports.get_statistics(params), ensure_ascii=False).encode('utf-8')
+                ReportService.send(request, HTTPStatus.OK, 'application/json; charset=utf-8', content)
+            else:
+                ReportService.send(request, HTTPStatus.OK, 'application/pdf', self.reports.create_report(params))
+        except Exception:
+            traceback.print_exc()
+            ReportService.send_error(request, HTTPStatus.INTERNAL_SERVER_ERROR, 'Ошибка при создании отчета')
+
+    @staticmethod
+    def send(request: BaseHTTPRequestHandler, status: HTTPStatus, content_type: str, content: bytes):
+        """Отправляет ответ на запрос.
+
+        Args:
+            request (BaseHTTPRequestHandler): Запрос
+            status (HTTPStatus): Код ответа
+            content_type (str): Тип содержимого ответа
+            content (bytes): Содержимое ответа
+        """
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
+
+    @staticmethod
+    def send_error(request: BaseHTTPRequestHandler, status: HTTPStatus, message: str):
+        """Отправляет ответ с ошибкой в формате JSON.
+
+        Args:
+            request (BaseHTTPRequestHandler): Запрос
+            status (HTTPStatus): Код ответа
+            message (str): Описание ошибки
+        """
+        content = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        ReportService.send(request, status, 'application/json; charset=utf-8', content)
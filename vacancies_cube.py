@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+
+class VacanciesCube:
+    """Класс, используемый для хранения предварительно агрегированной статистики вакансий.
+
+    Куб содержит сумму и количество зарплат и количество вакансий для каждой комбинации
+    названия вакансии, региона и года публикации. Комбинации хранятся в порядке их первого
+    появления в файле, поэтому статистика из куба совпадает со статистикой по исходным строкам.
+    Куб сохраняется рядом с csv файлом в формате Feather вместе с размером, временем изменения
+    и хэшем sha256 той части csv файла, по которой он построен. Если файл только дописывался,
+    куб пересчитывается только для дописанных строк, при любом другом изменении файла куб строится заново.
+    Без пакета pyarrow куб не сохраняется и строится при каждом вызове load.
+
+    Attributes:
+        csv_filename (str): Имя csv файла с вакансиями
+        cube_filename (str): Имя файла куба
+    """
+
+    key_columns = ['name', 'area_name', 'publish_year']
+    value_columns = ['salary_sum', 'salary_count', 'vacancy_count']
+    category_columns = ['name', 'area_name']
+    hash_block_size = 1 << 20
+
+    def __init__(self, csv_filename: str):
+        """Инициализирует экземпляр VacanciesCube.
+
+        Args:
+            csv_filename (str): Имя csv файла с вакансиями
+        """
+        self.csv_filename = csv_filename
+        self.cube_filename = f'{os.path.splitext(csv_filename)[0]}.cube.feather'
+
+    @staticmethod
+    def aggregate(data: pd.DataFrame):
+        """Группирует вакансии по названию, региону и году публикации.
+
+        Args:
+            data (pd.DataFrame): Вакансии со столбцами name, area_name, publish_year и salary
+
+        Returns:
+            pd.DataFrame: Куб со столбцами key_columns и value_columns
+        """
+        cube = data.groupby(VacanciesCube.key_columns, sort=False, dropna=False, observed=True)['salary'] \
+            .agg(['sum', 'count', 'size']).reset_index()
+        cube.columns = VacanciesCube.key_columns + VacanciesCube.value_columns
+        cube[['name', 'area_name']] = cube[['name', 'area_name']].astype('object')
+        return cube
+
+    @staticmethod
+    def merge(cube: pd.DataFrame, appended_cube: pd.DataFrame):
+        """Добавляет к кубу куб дописанных вакансий.
+
+        Args:
+            cube (pd.DataFrame): Куб
+            appended_cube (pd.DataFrame): Куб дописанных вакансий
+
+        Returns:
+            pd.DataFrame: Объединенный куб
+        """
+        return pd.concat([cube, appended_cube], ignore_index=True) \
+            .groupby(VacanciesCube.key_columns, sort=False, dropna=False)[VacanciesCube.value_columns] \
+            .sum().reset_index()
+
+    def update_source_hash(self, source_hash, offset: int, size: int):
+        """Дополняет хэш байтами csv файла с позиции offset до позиции size.
+
+        Args:
+            source_hash: Объект хэша sha256
+            offset (int): Позиция, с которой читается файл
+            size (int): Позиция, до которой читается файл
+
+        Returns:
+            Объект хэша source_hash
+        """
+        size -= offset
+        with open(self.csv_filename, 'rb') as csv_file:
+            csv_file.seek(offset)
+            while size > 0:
+                block = csv_file.read(min(size, VacanciesCube.hash_block_size))
+                if not block:
+                    break
+                source_hash.update(block)
+                size -= len(block)
+        return source_hash
+
+    def read_appended_vacancies(self, offset: int):
+        """Читает вакансии, дописанные в конец csv файла после позиции offset.
+
+        Args:
+            offset (int): Позиция начала дописанных строк
+
+        Returns:
+            pd.DataFrame: Дописанные вакансии со столбцом publish_year
+        """
+        columns = pd.read_csv(self.csv_filename, delimiter=',', nrows=0).columns
+        with open(self.csv_filename, 'rb') as csv_file:
+            csv_file.seek(offset)
+            if not csv_file.read().strip():
+                return pd.DataFrame(columns=list(columns) + ['publish_year'])
+            csv_file.seek(offset)
+            data = pd.read_csv(csv_file, delimiter=',', names=columns, header=None, encoding='utf-8')
+        data['publish_year'] = data['published_at'].str[:4].astype('int')
+        return data
+
+    def read_saved_cube(self):
+        """Читает сохраненный куб и состояние csv файла, по которому он построен.
+
+        Returns:
+            tuple: Куб и состояние csv файла (size, mtime_ns, sha256), None - если куб не сохранен
+        """
+        if feather is None or not os.path.exists(self.cube_filename):
+            return None
+        table = feather.read_table(self.cube_filename)
+        state = json.loads(table.schema.metadata[b'source_state'])
+        cube = table.to_pandas()
+        for column in VacanciesCube.category_columns:
+            cube[column] = cube[column].astype('object').where(cube[column].notna(), np.nan)
+        return cube, state
+
+    def save_cube(self, cube: pd.DataFrame, state: dict):
+        """Сохраняет куб и состояние csv файла во временный файл и заменяет им сохраненный куб.
+
+        Args:
+            cube (pd.DataFrame): Куб
+            state (dict): Состояние csv файла (size, mtime_ns, sha256)
+        """
+        table = pa.Table.from_pandas(cube, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               b'source_state': json.dumps(state).encode('utf-8')})
+        feather.write_feather(table, f'{self.cube_filename}.tmp')
+        os.replace(f'{self.cube_filename}.tmp', self.cube_filename)
+
+    def load(self, read_vacancies):
+        """Возвращает куб, при необходимости строя или дополняя его.
+
+        Если размер и время изменения csv файла совпадают с сохраненными, сохраненный куб возвращается
+        без чтения файла. Иначе хэшируется часть файла, по которой построен куб: если хэш совпадает,
+        а файл стал больше, в куб добавляются только дописанные строки, если файл не изменился по содержимому,
+        куб используется без изменений. В остальных случаях куб строится заново по всем вакансиям.
+        Хэш всего файла для сохранения куба вычисляется продолжением хэша его начала.
+
+        Args:
+            read_vacancies: Функция, принимающая имя csv файла и возвращающая все вакансии
+                со столбцом publish_year
+
+        Returns:
+            pd.DataFrame: Куб со столбцами key_columns и value_columns
+        """
+        source_stat = os.stat(self.csv_filename)
+        size = source_stat.st_size
+        saved = self.read_saved_cube()
+        cube = None
+        if saved is not None:
+            saved_cube, state = saved
+            if state['size'] == size and state['mtime_ns'] == source_stat.st_mtime_ns:
+                return saved_cube
+            if state['size'] <= size:
+                source_hash = self.update_source_hash(hashlib.sha256(), 0, state['size'])
+                if source_hash.hexdigest() == state['sha256']:
+                    if state['size'] == size:
+                        cube = saved_cube
+                    else:
+                        appended_cube = VacanciesCube.aggregate(self.read_appended_vacancies(state['size']))
+                        cube = VacanciesCube.merge(saved_cube, appended_cube)
+                    source_hash = self.update_source_hash(source_hash, state['size'], size)
+        if cube is None:
+            cube = VacanciesCube.aggregate(read_vacancies(self.csv_filename))
+            source_hash = self.update_source_hash(hashlib.sha256(), 0, size)
+        if feather is not None:
+            self.save_cube(cube, {'size': size, 'mtime_ns': source_stat.st_mtime_ns,
+                                  'sha256': source_hash.hexdigest()})
+        return cube